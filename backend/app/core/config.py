@@ -24,6 +24,8 @@ class Settings(BaseSettings):
     # Настройки ML-сервиса
     ML_SERVICE_URL: str = "http://localhost:8000"
     ML_SERVICE_TIMEOUT: int = 30
+    # Сколько ожидающих предсказаний воркер отправляет в ML-сервис одним запросом /predict/batch
+    ML_PREDICT_BATCH_SIZE: int = 20
     # Маппинг между внутренними ID моделей и типами моделей ML-сервиса
     ML_MODEL_MAPPING: dict = {
         1: "random_forest",
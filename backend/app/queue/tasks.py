@@ -51,9 +51,43 @@ def mock_prediction(input_data):
         "forecasts": forecasts
     }
 
+# Забирает задачу и до ML_PREDICT_BATCH_SIZE - 1 других ожидающих задач, переводя их в "processing".
+# Строки, уже захваченные другим воркером, пропускаются (SKIP LOCKED)
+def claim_predictions(db: Session, prediction_id: int):
+    """Захват задачи вместе с другими ожидающими задачами для одного пакетного запроса"""
+    predictions = (
+        db.query(Prediction)
+        .filter(Prediction.status == PredictionStatus.QUEUED.value)
+        .order_by((Prediction.id == prediction_id).desc(), Prediction.id)
+        .limit(settings.ML_PREDICT_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    # Своя задача уже обработана в пакете другой задачи
+    if not predictions or predictions[0].id != prediction_id:
+        db.rollback()
+        return []
+    
+    for prediction in predictions:
+        prediction.status = PredictionStatus.PROCESSING.value
+    db.commit()
+    return predictions
+
+# Сохраняет результат задачи
+def complete_prediction(db: Session, prediction: Prediction, status: PredictionStatus, result):
+    prediction.status = status.value
+    prediction.result = result
+    prediction.completed_at = datetime.utcnow()
+    db.commit()
+
 # Функция обработки задачи предсказания
 def process_prediction(prediction_id: int):
-    """Обработка задачи предсказания"""
+    """Обработка задачи предсказания вместе с другими ожидающими задачами
+    
+    Все захваченные задачи отправляются в ML-сервис одним запросом /predict/batch,
+    ошибка отдельного элемента не влияет на остальные. Задачи, для которых
+    ML-сервис вернул ошибку, сохраняются со статусом "error".
+    """
     # Создаем новую сессию БД
     db = SessionLocal()
     try:
@@ -62,51 +96,49 @@ def process_prediction(prediction_id: int):
         if not prediction:
             return {"error": f"Предсказание с ID {prediction_id} не найдено"}
         
-        # Обновляем статус на "processing"
-        prediction.status = PredictionStatus.PROCESSING.value
-        db.commit()
+        predictions = claim_predictions(db, prediction_id)
+        if not predictions:
+            db.refresh(prediction)
+            return prediction.result
         
         try:
             # Получаем тип модели из ML_MODEL_MAPPING
-            model_id = prediction.model_id
-            model_type = settings.ML_MODEL_MAPPING.get(model_id, "random_forest")
+            items = [
+                {
+                    "model_type": settings.ML_MODEL_MAPPING.get(p.model_id, "random_forest"),
+                    "input_data": p.input_data
+                }
+                for p in predictions
+            ]
             
-            # Выполняем предсказание через ML-сервис
+            # Выполняем предсказания через ML-сервис одним запросом, графики не нужны
             try:
-                # Отправляем запрос к ML-сервису
-                ml_result = ml_service.predict(model_type, prediction.input_data)
-                
-                # Преобразуем результат в формат, ожидаемый приложением
-                # Передаем также входные данные для получения информации о периоде
-                result = ml_service.convert_prediction_to_app_format(
-                    ml_result, 
-                    prediction.input_data
-                )
-                
-                # Обновляем запись в БД
-                prediction.status = PredictionStatus.DONE.value
-                prediction.result = result
-                prediction.completed_at = datetime.utcnow()
-                db.commit()
-                
-                return result
+                ml_results = ml_service.predict_batch(items)["results"]
             except MLServiceError as e:
-                # В случае ошибки в ML-сервисе используем заглушку
-                print(f"Ошибка ML-сервиса: {e}, используем заглушку")
-                result = mock_prediction(prediction.input_data)
-                
-                prediction.status = PredictionStatus.DONE.value
-                prediction.result = result
-                prediction.completed_at = datetime.utcnow()
-                db.commit()
-                
-                return result
+                print(f"Ошибка ML-сервиса: {e}")
+                ml_results = [{"error": str(e)} for _ in predictions]
+            
+            results = {}
+            for p, ml_result in zip(predictions, ml_results):
+                if ml_result.get("result") is not None:
+                    # Преобразуем результат в формат, ожидаемый приложением
+                    # Передаем также входные данные для получения информации о периоде
+                    result = ml_service.convert_prediction_to_app_format(ml_result["result"], p.input_data)
+                    complete_prediction(db, p, PredictionStatus.DONE, result)
+                else:
+                    # Ошибка сохраняется как есть, случайный результат заглушки не выдается за предсказание
+                    print(f"Ошибка ML-сервиса для предсказания {p.id}: {ml_result.get('error')}")
+                    result = {"error": ml_result.get("error") or "Нет результата от ML-сервиса"}
+                    complete_prediction(db, p, PredictionStatus.ERROR, result)
+                results[p.id] = result
+            
+            return results[prediction_id]
         except Exception as e:
-            # В случае ошибки обновляем статус
-            prediction.status = PredictionStatus.ERROR.value
-            prediction.result = {"error": str(e)}
-            prediction.completed_at = datetime.utcnow()
-            db.commit()
+            # В случае ошибки обновляем статус незавершенных задач
+            db.rollback()
+            for p in predictions:
+                if p.status == PredictionStatus.PROCESSING.value:
+                    complete_prediction(db, p, PredictionStatus.ERROR, {"error": str(e)})
             return {"error": str(e)}
     finally:
         db.close()
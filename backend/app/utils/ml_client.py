@@ -69,6 +69,37 @@ class MLServiceClient:
             
         return self._make_request('POST', '/predict', json=data)
     
+    def predict_batch(self, items: List[Dict[str, Any]], charts: bool = False) -> Dict[str, Any]:
+        """Выполнение нескольких предсказаний за один запрос к ML-сервису
+        
+        Args:
+            items: Список пар (model_type, input_data) в виде словарей
+                   {"model_type": ..., "input_data": ...}
+            charts: Нужны ли ссылки на графики в ответе
+                        
+        Returns:
+            Dict с результатами по каждому элементу в порядке запроса,
+            ошибка одного элемента (в том числе некорректного) не прерывает остальные
+        """
+        data = {
+            "charts": charts,
+            "items": [
+                {
+                    "crypto": item["input_data"].get("coin", "btc").lower(),
+                    "days": item["input_data"].get("period", 7),
+                    "model_type": item["model_type"]
+                }
+                for item in items
+            ]
+        }
+        
+        # Каждая пара (криптовалюта, модель) может потребовать обучения модели с нуля,
+        # поэтому таймаут растет с числом таких пар в пакете
+        groups = {(item["crypto"], item["model_type"]) for item in data["items"]}
+        timeout = self.timeout * max(len(groups), 1)
+        
+        return self._make_request('POST', '/predict/batch', json=data, timeout=timeout)
+    
     def retrain_model(self, model_type: str) -> Dict[str, Any]:
         """Запуск переобучения модели"""
         return self._make_request('POST', '/retrain', json={"model_type": model_type})
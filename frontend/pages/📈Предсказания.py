@@ -4,7 +4,7 @@ import numpy as np
 import json
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-from utils import check_authentication, get_models, create_prediction, get_predictions_history, get_prediction, get_current_price
+from utils import check_authentication, get_models, create_prediction, get_predictions_history, get_prediction, get_current_prices
 # Конфигурация страницы
 st.set_page_config(
     page_title="Предсказания",
@@ -19,12 +19,9 @@ st.title("Предсказания цен криптовалют")
 current_user = check_authentication()
 
 # Функция для отображения текущей цены криптовалюты
-def display_current_price(crypto):
+def display_current_price(crypto, price_data):
     st.subheader("Текущая цена")
     
-    with st.spinner("Загрузка текущей цены..."):
-        price_data = get_current_price(crypto.lower())
-    
     if "error" in price_data:
         st.error(price_data["error"])
     else:
@@ -142,12 +139,18 @@ if response.status_code == 200:
                         "processing": "Обрабатывается",
                         "done": "Завершено",
                         "completed": "Завершено",
-                        "failed": "Ошибка"
+                        "failed": "Ошибка",
+                        "error": "Ошибка"
                     }
                     status = status_map.get(prediction_details.get("status"), prediction_details.get("status"))
                     
                     st.info(f"ID предсказания: {prediction_id} | Статус: {status} | Криптовалюта: {prediction_details.get('input_data', {}).get('coin', 'N/A')}")
-                    display_current_price(coin)
+                    
+                    # Цены всех нужных на странице криптовалют одним запросом
+                    prediction_coin = prediction_details.get('input_data', {}).get('coin', 'BTC')
+                    with st.spinner("Загрузка текущей цены..."):
+                        current_prices = get_current_prices([coin, prediction_coin])
+                    display_current_price(coin, current_prices[coin.lower()])
 
                     
                     # Если предсказание завершено и есть результаты, показываем их
@@ -165,9 +168,9 @@ if response.status_code == 200:
                         
                         try:
                             # Получаем криптовалюту из данных предсказания
-                            crypto = prediction_details.get('input_data', {}).get('coin', 'BTC')
+                            crypto = prediction_coin
                             
-                            current_price_data = get_current_price(crypto.lower())
+                            current_price_data = current_prices[crypto.lower()]
                             if not "error" in current_price_data:
                                 current_price = current_price_data.get("price")
                                 
@@ -301,8 +304,9 @@ if response.status_code == 200:
                             st.subheader("Дополнительная аналитика")
                             st.json(result["analytics"])
                     
-                    elif prediction_details.get("status") == "failed":
-                        st.error("Предсказание завершилось с ошибкой")
+                    elif prediction_details.get("status") in ["failed", "error"]:
+                        error = (prediction_details.get("result") or {}).get("error")
+                        st.error(f"Предсказание завершилось с ошибкой: {error}" if error else "Предсказание завершилось с ошибкой")
                     elif prediction_details.get("status") in ["queued", "processing"]:
                         st.warning("Предсказание еще обрабатывается. Пожалуйста, подождите...")
                         # Добавляем автоматическое обновление страницы каждые 5 секунд
@@ -328,7 +332,8 @@ if response.status_code == 200:
                         "processing": "Обрабатывается",
                         "done": "Завершено", 
                         "completed": "Завершено",
-                        "failed": "Ошибка"
+                        "failed": "Ошибка",
+                        "error": "Ошибка"
                     }
                     
                     status = status_map.get(pred.get("status"), pred.get("status"))
@@ -120,3 +120,19 @@ def get_current_price(crypto):
             return {"error": f"u041eu0448u0438u0431u043au0430 u043fu043eu043bu0443u0447u0435u043du0438u044f u0446u0435u043du044b: {response.status_code}"}
     except Exception as e:
         return {"error": f"u041eu0448u0438u0431u043au0430 u0441u0432u044fu0437u0438 u0441 ML-u0441u0435u0440u0432u0438u0441u043eu043c: {str(e)}"}
+
+# Функция для получения текущих цен нескольких криптовалют одним запросом к ML-сервису
+def get_current_prices(cryptos):
+    ML_SERVICE_URL = os.environ.get("ML_SERVICE_URL", "http://ml-service:8000")
+    cryptos = list(dict.fromkeys(crypto.lower() for crypto in cryptos))
+    
+    try:
+        response = requests.get(f"{ML_SERVICE_URL}/current-prices", params={"symbols": ",".join(cryptos)})
+        if response.status_code == 200:
+            prices = response.json().get("prices", {})
+            return {crypto: prices.get(crypto, {"error": "Цена не найдена"}) for crypto in cryptos}
+        else:
+            error = {"error": f"Ошибка получения цены: {response.status_code}"}
+    except Exception as e:
+        error = {"error": f"Ошибка связи с ML-сервисом: {str(e)}"}
+    return {crypto: error for crypto in cryptos}
@@ -0,0 +1,394 @@
+# ml_service/app/artifacts.py
+import os
+import json
+import pickle
+import shutil
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .features import FeaturePipeline
+
+
+logger = logging.getLogger("ml-service")
+
+# Bumped whenever the layout of an artifact directory changes
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# Node arrays of a packed forest, one .npy file each. Forests packed before "missing"
+# was added send missing values right.
+FOREST_ARRAYS = ["roots", "feature", "threshold", "left", "right", "missing", "value"]
+# and of packed XGBoost boosters, plus the NaN child and where each output's trees start
+BOOSTER_ARRAYS = ["roots", "feature", "threshold", "children", "missing", "value", "starts"]
+
+
+class PackedForest:
+    """A random forest flattened into a few contiguous node arrays.
+
+    Every tree's nodes are concatenated with global child indices, leaves
+    point at themselves, so all trees are walked for all rows at once with a
+    fixed number of vectorised steps. The arrays are plain ``.npy`` files
+    opened with ``mmap_mode="r"``: loading is near-instant and processes that
+    load the same artifact share the pages instead of holding private copies.
+    Rows with a missing feature follow the ``missing`` child, as sklearn
+    does. Predictions equal the sklearn forest's exactly.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], n_outputs: int, max_depth: int,
+                 target_mean: Optional[np.ndarray] = None, target_scale: Optional[np.ndarray] = None):
+        # np.asarray drops the memmap subclass, indexing plain views is cheaper
+        self.roots = np.asarray(arrays["roots"])
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        self.left = np.asarray(arrays["left"])
+        self.right = np.asarray(arrays["right"])
+        self.missing = np.asarray(arrays["missing"]) if "missing" in arrays else self.right
+        self.value = np.asarray(arrays["value"])
+        self.n_outputs = n_outputs
+        self.max_depth = max_depth
+        self.target_mean = target_mean
+        self.target_scale = target_scale
+
+    @classmethod
+    def from_estimator(cls, model) -> "PackedForest":
+        """Pack a fitted RandomForestRegressor/ExtraTreesRegressor, optionally wrapped in a
+        TransformedTargetRegressor with a StandardScaler."""
+        target_mean = target_scale = None
+        if hasattr(model, "regressor_"):
+            target_mean = np.asarray(model.transformer_.mean_, dtype=np.float64)
+            target_scale = np.asarray(model.transformer_.scale_, dtype=np.float64)
+            model = model.regressor_
+
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.concatenate([[0], np.cumsum([tree.node_count for tree in trees])[:-1]])
+
+        def children(tree, child, offset):
+            # Leaves (child == -1) loop back to themselves
+            return np.where(child >= 0, child, np.arange(tree.node_count)) + offset
+
+        arrays = {
+            "roots": offsets.astype(np.int32),
+            # Leaves have feature -2, any valid column works since both children are the leaf itself
+            "feature": np.concatenate([np.maximum(tree.feature, 0) for tree in trees]).astype(np.int32),
+            "threshold": np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+            "left": np.concatenate([children(t, t.children_left, o) for t, o in zip(trees, offsets)]).astype(np.int32),
+            "right": np.concatenate([children(t, t.children_right, o) for t, o in zip(trees, offsets)]).astype(np.int32),
+            # Child a missing value goes to: the learned side, or the larger child for features
+            # that had no missing values in training
+            "missing": np.concatenate([
+                children(t, np.where(t.missing_go_to_left, t.children_left, t.children_right), o)
+                for t, o in zip(trees, offsets)
+            ]).astype(np.int32),
+            "value": np.concatenate([tree.value.reshape(tree.node_count, -1) for tree in trees]).astype(np.float64),
+        }
+        return cls(arrays, model.n_outputs_, max(tree.max_depth for tree in trees), target_mean, target_scale)
+
+    def predict(self, X) -> np.ndarray:
+        # sklearn compares float32 inputs against float64 thresholds, so do we
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, None]
+        has_nan = np.isnan(X).any()
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            step = np.where(values <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+            nodes = np.where(np.isnan(values), self.missing[nodes], step) if has_nan else step
+        preds = self.value[nodes].mean(axis=1)
+        if self.target_scale is not None:
+            preds = preds * self.target_scale + self.target_mean
+        return preds[:, 0] if self.n_outputs == 1 else preds
+
+    @property
+    def nbytes(self) -> int:
+        arrays = {id(getattr(self, name)): getattr(self, name) for name in FOREST_ARRAYS}
+        return sum(array.nbytes for array in arrays.values())
+
+
+class PackedBoosters:
+    """XGBoost trees flattened into node arrays like PackedForest.
+
+    Loading memory-maps the arrays instead of parsing the booster, which
+    costs about as much as unpickling it, and the vectorised walk beats the
+    booster's per-call overhead on the few rows a forecast predicts. Every
+    tree adds its leaf value to one output: trees are sorted by output and
+    ``starts`` holds where each output's trees begin. As in XGBoost, rows are
+    compared in float32, go left below the threshold and follow the
+    ``missing`` child on NaN. Predictions equal the booster's up to float32
+    rounding of the leaf sums.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], max_depth: int, base_score: np.ndarray):
+        self.roots = np.asarray(arrays["roots"])
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        # (nodes, 2): left and right child
+        self.children = np.asarray(arrays["children"])
+        self.missing = np.asarray(arrays["missing"])
+        self.value = np.asarray(arrays["value"])
+        self.starts = np.asarray(arrays["starts"])
+        self.n_outputs = len(self.starts)
+        self.max_depth = max_depth
+        self.base_score = np.asarray(base_score, dtype=np.float64)
+
+    @classmethod
+    def from_estimator(cls, model) -> "PackedBoosters":
+        """Pack a fitted XGBRegressor with the squared error objective, raises ValueError for
+        anything else (other objectives, categorical splits, vector leaves)."""
+        learner = json.loads(model.get_booster().save_raw("json"))["learner"]
+        if learner["objective"]["name"] != "reg:squarederror" or learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"Unsupported XGBoost model: {learner['objective']['name']}")
+        booster = learner["gradient_booster"]["model"]
+        base_score = np.atleast_1d(np.asarray(json.loads(learner["learner_model_param"]["base_score"]), dtype=np.float64))
+        n_outputs = len(base_score)
+
+        trees = sorted(zip(booster["tree_info"], booster["trees"]), key=lambda tree: tree[0])
+        outputs = np.array([output for output, _ in trees])
+        if not np.array_equal(np.unique(outputs), np.arange(n_outputs)):
+            raise ValueError("Every output needs at least one tree")
+
+        columns = {name: [] for name in ("feature", "threshold", "children", "missing", "value")}
+        roots, max_depth = [], 0
+        for _, tree in trees:
+            if any(tree["split_type"]) or tree["tree_param"]["size_leaf_vector"] not in ("0", "1"):
+                raise ValueError("Unsupported XGBoost tree: categorical splits or vector leaves")
+            offset = sum(len(feature) for feature in columns["feature"])
+            left = np.asarray(tree["left_children"])
+            right = np.asarray(tree["right_children"])
+            # Leaves keep their value in split_conditions
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            is_leaf = left < 0
+
+            depth = np.zeros(len(left), dtype=np.int64)
+            reached = [0]
+            for i in reached:
+                if not is_leaf[i]:
+                    depth[left[i]] = depth[right[i]] = depth[i] + 1
+                    reached += [left[i], right[i]]
+            max_depth = max(max_depth, int(depth[reached].max()))
+
+            # Leaves loop back to themselves
+            left = np.where(is_leaf, np.arange(len(left)), left) + offset
+            right = np.where(is_leaf, np.arange(len(right)), right) + offset
+            roots.append(offset)
+            columns["feature"].append(np.where(is_leaf, 0, tree["split_indices"]))
+            columns["threshold"].append(np.where(is_leaf, 0, conditions))
+            columns["children"].append(np.column_stack([left, right]))
+            columns["missing"].append(np.where(np.asarray(tree["default_left"]) > 0, left, right))
+            columns["value"].append(np.where(is_leaf, conditions, 0))
+
+        arrays = {
+            "roots": np.array(roots, dtype=np.int32),
+            "feature": np.concatenate(columns["feature"]).astype(np.int32),
+            "threshold": np.concatenate(columns["threshold"]).astype(np.float32),
+            "children": np.concatenate(columns["children"]).astype(np.int32),
+            "missing": np.concatenate(columns["missing"]).astype(np.int32),
+            "value": np.concatenate(columns["value"]).astype(np.float64),
+            "starts": np.searchsorted(outputs, np.arange(n_outputs)).astype(np.int32),
+        }
+        return cls(arrays, max_depth, base_score)
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, None]
+        has_nan = np.isnan(X).any()
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            step = self.children[nodes, (values >= self.threshold[nodes]).view(np.uint8)]
+            nodes = np.where(np.isnan(values), self.missing[nodes], step) if has_nan else step
+        preds = np.add.reduceat(self.value[nodes], self.starts, axis=1) + self.base_score
+        return preds[:, 0] if self.n_outputs == 1 else preds
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in BOOSTER_ARRAYS)
+
+
+class BoosterStack:
+    """LightGBM boosters of a MultiOutputRegressor behind one predict call."""
+
+    def __init__(self, boosters):
+        self.boosters = boosters
+
+    def predict(self, X) -> np.ndarray:
+        return np.column_stack([booster.predict(X) for booster in self.boosters])
+
+
+def _is_forest(model) -> bool:
+    if not type(model).__module__.startswith("sklearn."):
+        return False
+    from sklearn.compose import TransformedTargetRegressor
+    from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    if isinstance(model, TransformedTargetRegressor):
+        return isinstance(model.transformer_, StandardScaler) and _is_forest(model.regressor_)
+    return isinstance(model, (RandomForestRegressor, ExtraTreesRegressor))
+
+
+def _save_component(model, directory: str, name: str) -> Dict[str, Any]:
+    # Write one estimator in its native format and return its manifest entry
+    module = type(model).__module__
+    if isinstance(model, FeaturePipeline):
+        # Only its settings, kept in the manifest
+        return {"kind": "pipeline", "config": model.to_config()}
+    if _is_forest(model):
+        packed = PackedForest.from_estimator(model)
+        os.makedirs(os.path.join(directory, name))
+        for array in FOREST_ARRAYS:
+            np.save(os.path.join(directory, name, f"{array}.npy"), getattr(packed, array))
+        entry = {"kind": "forest", "path": name, "n_outputs": packed.n_outputs, "max_depth": packed.max_depth}
+        if packed.target_scale is not None:
+            entry["target_mean"] = packed.target_mean.tolist()
+            entry["target_scale"] = packed.target_scale.tolist()
+        return entry
+    if module.startswith("xgboost"):
+        try:
+            packed = PackedBoosters.from_estimator(model)
+        except ValueError as e:
+            logger.warning(f"Saving {name} as an XGBoost model file: {e}")
+            model.save_model(os.path.join(directory, f"{name}.ubj"))
+            return {"kind": "xgboost", "path": f"{name}.ubj"}
+        os.makedirs(os.path.join(directory, name))
+        for array in BOOSTER_ARRAYS:
+            np.save(os.path.join(directory, name, f"{array}.npy"), getattr(packed, array))
+        return {"kind": "xgboost_trees", "path": name, "max_depth": packed.max_depth, "base_score": packed.base_score.tolist()}
+    # LightGBM boosters are kept as their model text, which any LightGBM version reads.
+    # Leaf-wise trees run deep enough that the booster predicts a few rows faster than
+    # a packed walk would.
+    if module.startswith("lightgbm"):
+        boosters = [model.booster_]
+    elif module.startswith("sklearn.multioutput") and all(
+        type(estimator).__module__.startswith("lightgbm") for estimator in model.estimators_
+    ):
+        boosters = [estimator.booster_ for estimator in model.estimators_]
+    else:
+        boosters = None
+    if boosters is not None:
+        paths = [f"{name}.txt"] if len(boosters) == 1 else [f"{name}.{i}.txt" for i in range(len(boosters))]
+        for booster, path in zip(boosters, paths):
+            with open(os.path.join(directory, path), "w") as f:
+                f.write(booster.model_to_string())
+        return {"kind": "lightgbm", "paths": paths}
+    if module.startswith("prophet"):
+        from prophet.serialize import model_to_json
+
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            f.write(model_to_json(model))
+        return {"kind": "prophet", "path": f"{name}.json"}
+
+    # Anything else is stored uncompressed so its arrays can still be memory-mapped
+    import joblib
+
+    joblib.dump(model, os.path.join(directory, f"{name}.joblib"))
+    return {"kind": "joblib", "path": f"{name}.joblib"}
+
+
+def _load_component(directory: str, entry: Dict[str, Any]):
+    kind = entry["kind"]
+    if kind == "pipeline":
+        return FeaturePipeline.from_config(entry["config"])
+    if kind == "forest":
+        arrays = {
+            array: np.load(os.path.join(directory, entry["path"], f"{array}.npy"), mmap_mode="r")
+            for array in FOREST_ARRAYS
+            if os.path.exists(os.path.join(directory, entry["path"], f"{array}.npy"))
+        }
+        target_mean = np.asarray(entry["target_mean"]) if "target_mean" in entry else None
+        target_scale = np.asarray(entry["target_scale"]) if "target_scale" in entry else None
+        return PackedForest(arrays, entry["n_outputs"], entry["max_depth"], target_mean, target_scale)
+    if kind == "xgboost_trees":
+        arrays = {
+            array: np.load(os.path.join(directory, entry["path"], f"{array}.npy"), mmap_mode="r")
+            for array in BOOSTER_ARRAYS
+        }
+        return PackedBoosters(arrays, entry["max_depth"], np.asarray(entry["base_score"]))
+    if kind == "xgboost":
+        import xgboost as xgb
+
+        model = xgb.XGBRegressor()
+        model.load_model(os.path.join(directory, entry["path"]))
+        return model
+    if kind == "lightgbm":
+        import lightgbm as lgb
+
+        if "pickle" in entry:
+            # Artifacts written while the boosters were pickled, readable by the LightGBM version that wrote them
+            with open(os.path.join(directory, entry["pickle"]), "rb") as f:
+                boosters = pickle.load(f)
+        else:
+            boosters = []
+            for path in entry["paths"]:
+                with open(os.path.join(directory, path)) as f:
+                    boosters.append(lgb.Booster(model_str=f.read()))
+        return boosters[0] if len(boosters) == 1 else BoosterStack(boosters)
+    if kind == "prophet":
+        from prophet.serialize import model_from_json
+
+        with open(os.path.join(directory, entry["path"])) as f:
+            return model_from_json(f.read())
+    if kind == "joblib":
+        import joblib
+
+        return joblib.load(os.path.join(directory, entry["path"]), mmap_mode="r")
+    raise ValueError(f"Unknown model component kind: {kind}")
+
+
+def is_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def save_artifact(path: str, models: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+    """Write a bundle of estimators as an artifact directory and swap it in place of ``path``.
+
+    Components are written to a temporary directory next to ``path`` and the
+    manifest goes last, so a directory with a manifest is always complete.
+    Readers that still have the previous version memory-mapped keep working,
+    its files are only unlinked.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        components = {name: _save_component(model, tmp_path, name) for name, model in models.items()}
+        manifest = {
+            "format": FORMAT_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "components": components,
+            **(metadata or {}),
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def load_artifact(path: str) -> Dict[str, Any]:
+    """Load every component of an artifact directory, forests and boosters are memory-mapped."""
+    manifest = read_manifest(path)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format {manifest.get('format')} in {path}")
+    return {name: _load_component(path, entry) for name, entry in manifest["components"].items()}
+
+
+def artifact_size(path: str) -> int:
+    """Bytes on disk of an artifact directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
@@ -0,0 +1,65 @@
+# ml_service/app/backfill.py
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .config import KLINE_PAGE_LIMIT, BACKFILL_WORKERS
+from .candle_store import CANDLE_COLUMNS, COLUMN_DTYPES, interval_to_ms
+
+
+logger = logging.getLogger("ml-service")
+
+# fetch_page(symbol, interval, start_ms, end_ms, limit) -> column arrays.
+# Rate limiting and retries are up to the fetcher, see exchange.BybitClient.
+PageFetcher = Callable[[str, str, int, int, int], Dict[str, np.ndarray]]
+
+
+def split_range(start_ms: int, end_ms: int, interval: str, page_limit: int = KLINE_PAGE_LIMIT) -> List[Tuple[int, int]]:
+    """Split [start_ms, end_ms] into windows holding at most ``page_limit`` candles each."""
+    page_ms = interval_to_ms(interval) * page_limit
+    return [
+        (page_start, min(page_start + page_ms - 1, end_ms))
+        for page_start in range(start_ms, end_ms + 1, page_ms)
+    ]
+
+
+def stitch_pages(pages: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenate pages into one series ordered by timestamp without duplicates."""
+    pages = [page for page in pages if len(page["timestamp"])]
+    if not pages:
+        return {column: np.empty(0, dtype=COLUMN_DTYPES[column]) for column in CANDLE_COLUMNS}
+    columns = {column: np.concatenate([page[column] for page in pages]) for column in CANDLE_COLUMNS}
+    _, index = np.unique(columns["timestamp"], return_index=True)
+    return {column: values[index] for column, values in columns.items()}
+
+
+def fetch_range(
+    fetch_page: PageFetcher,
+    symbol: str,
+    interval: str,
+    start_ms: int,
+    end_ms: int,
+    max_workers: int = BACKFILL_WORKERS,
+) -> Dict[str, np.ndarray]:
+    """Fetch every candle in [start_ms, end_ms], one page per request, pages in parallel."""
+    windows = split_range(start_ms, end_ms, interval)
+
+    def fetch(window):
+        return fetch_page(symbol, interval, window[0], window[1], KLINE_PAGE_LIMIT)
+
+    started = time.perf_counter()
+    if len(windows) == 1:
+        pages = [fetch(windows[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(windows))) as executor:
+            pages = list(executor.map(fetch, windows))
+
+    candles = stitch_pages(pages)
+    logger.info(
+        f"Fetched {len(candles['timestamp'])} {interval} candles for {symbol} "
+        f"in {len(windows)} page(s) in {time.perf_counter() - started:.2f}s"
+    )
+    return candles
@@ -0,0 +1,351 @@
+# ml_service/app/backtest.py
+import sys
+import json
+import time
+import logging
+import warnings
+import argparse
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import BACKTEST_CACHE_SIZE, BACKTEST_MAX_FOLDS, BACKTEST_FOLDS_IN_FLIGHT, TRAINING_WORKERS
+from .cache import TTLCache
+from .features import FeaturePipeline, CANDLE_FEATURES
+from .forecasting import MAX_HORIZON, CLOSE_INDEX, AUX_INDICES, make_predictor
+from .training import (
+    FIT_THREADS, prepare_training_data, make_close_model, make_multi_output_model,
+    fit_prophet_model, submit_training,
+)
+
+
+logger = logging.getLogger("ml-service")
+
+MODEL_NAMES = ["random_forest", "xgboost", "lightgbm", "prophet"]
+STRATEGIES = ["recursive", "direct"]
+# expanding: every fold trains on all candles before its cutoff,
+# rolling: on the last window_size candles before it
+WINDOWS = ["expanding", "rolling"]
+
+# Shortest training window: room for the feature warmup and the MAX_HORIZON targets of the direct model, twice over
+MIN_TRAIN_DAYS = 2 * (FeaturePipeline().warmup + MAX_HORIZON)
+
+# Results keyed by (crypto, parameters, number of candles, last candle time), a new candle changes the key
+backtest_cache = TTLCache("backtests", maxsize=BACKTEST_CACHE_SIZE)
+
+_HIGH = CANDLE_FEATURES.index("high")
+_LOW = CANDLE_FEATURES.index("low")
+
+
+class BatchRollingState:
+    """features.RollingState over many series at once, one per forecast origin of a fold.
+
+    Holds the same ring buffers and running window sums as numpy arrays with
+    a leading series axis, so one push advances every origin. ``row`` is a
+    (series, n_features) array updated in place. Serving forecasts a single
+    series and keeps to the scalar RollingState, which is cheaper for one row.
+    """
+
+    def __init__(self, pipeline: FeaturePipeline, df: pd.DataFrame, ends: np.ndarray):
+        if len(ends) == 0 or ends.min() < pipeline.warmup or ends.max() >= len(df):
+            raise ValueError(f"Feature pipeline needs {pipeline.warmup} earlier candles for every origin, got {len(df)} candles")
+        self.pipeline = pipeline
+        # Closes from `warmup` candles before each end up to the end, oldest first, the ring buffers start out in that order
+        self._closes = df["close"].to_numpy(dtype=np.float64)[ends[:, None] + np.arange(-pipeline.warmup, 1)]
+        self._close_head = self._closes.shape[1] - 1
+        returns = self._closes[:, 1:] / self._closes[:, :-1] - 1
+        self._returns = returns[:, -max(pipeline.windows):].copy()
+        self._return_head = self._returns.shape[1] - 1
+        self._close_sums = np.column_stack([self._closes[:, -w:].sum(axis=1) for w in pipeline.windows])
+        self._return_sums = np.column_stack([returns[:, -w:].sum(axis=1) for w in pipeline.windows])
+        self._return_squares = np.column_stack([(returns[:, -w:] ** 2).sum(axis=1) for w in pipeline.windows])
+        self._windows = np.array(pipeline.windows, dtype=np.float64)
+        self.row = np.empty((len(ends), len(pipeline)), dtype=np.float64)
+        self._fill(df[CANDLE_FEATURES].to_numpy(dtype=np.float64)[ends])
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def _close(self, k) -> np.ndarray:
+        # Closes k days before the latest candle, k may be an array of offsets
+        return self._closes[:, (self._close_head - np.asarray(k)) % self._closes.shape[1]]
+
+    def _return(self, k) -> np.ndarray:
+        return self._returns[:, (self._return_head - np.asarray(k)) % self._returns.shape[1]]
+
+    def push(self, candles: np.ndarray):
+        """Advance every series by one candle, given as values of CANDLE_FEATURES shaped (series, 6)."""
+        close = candles[:, CLOSE_INDEX]
+        daily_return = close / self._close(0) - 1
+        # The values dropping out of a w-day window are the ones w - 1 days before the current latest
+        offsets = np.array(self.pipeline.windows) - 1
+        leaving = self._return(offsets)
+        self._close_sums += close[:, None] - self._close(offsets)
+        self._return_sums += daily_return[:, None] - leaving
+        self._return_squares += (daily_return * daily_return)[:, None] - leaving * leaving
+        self._close_head = (self._close_head + 1) % self._closes.shape[1]
+        self._closes[:, self._close_head] = close
+        self._return_head = (self._return_head + 1) % self._returns.shape[1]
+        self._returns[:, self._return_head] = daily_return
+        self._fill(candles)
+
+    def _fill(self, candles: np.ndarray):
+        pipeline = self.pipeline
+        row = self.row
+        close = candles[:, CLOSE_INDEX]
+        i = len(CANDLE_FEATURES)
+        row[:, :i] = candles
+        lags, returns, windows = len(pipeline.lags), len(pipeline.returns), len(pipeline.windows)
+        row[:, i:i + lags] = self._close(pipeline.lags)
+        i += lags
+        row[:, i:i + returns] = close[:, None] / self._close(pipeline.returns) - 1
+        i += returns
+        row[:, i:i + windows] = self._close_sums / self._windows
+        i += windows
+        variance = (self._return_squares - self._return_sums * self._return_sums / self._windows) / (self._windows - 1)
+        row[:, i:i + windows] = np.sqrt(np.maximum(variance, 0.0))
+        i += windows
+        row[:, i] = (candles[:, _HIGH] - candles[:, _LOW]) / close
+
+
+def batch_forecast(models, state: BatchRollingState, n_days: int) -> np.ndarray:
+    """forecasting.pipeline_forecast of every series of ``state`` at once, shaped (series, n_days)."""
+    candles = np.empty((len(state), len(CANDLE_FEATURES)), dtype=np.float64)
+    preds = np.empty((len(state), n_days), dtype=np.float64)
+    predict_features = make_predictor(models["features"])
+    predict_close = make_predictor(models["close"])
+
+    for step in range(n_days):
+        candles[:, AUX_INDICES] = predict_features(state.row)
+        candles[:, CLOSE_INDEX] = preds[:, step] = predict_close(state.row)
+        state.push(candles)
+
+    return preds
+
+
+def walk_forward_folds(n_candles: int, min_train: int, step: int, window: str = "expanding",
+                       window_size: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """(train start, cutoff, origin end) of every fold over ``n_candles`` candles.
+
+    A fold trains on candles [train start, cutoff) and forecasts from every
+    origin candle in [cutoff - 1, origin end), so each origin is forecast by
+    the first model that has seen it and none of the candles after it.
+    Consecutive folds move the cutoff by ``step`` candles, at most
+    BACKTEST_MAX_FOLDS of them.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown backtest window {window}, expected one of {', '.join(WINDOWS)}")
+    if window == "rolling" and window_size is None:
+        window_size = min_train
+    if min(min_train, window_size or min_train) < MIN_TRAIN_DAYS:
+        raise ValueError(f"Backtest training windows need at least {MIN_TRAIN_DAYS} candles")
+    if step < 1:
+        raise ValueError("Backtest step must be at least 1 candle")
+    if n_candles <= min_train + 1:
+        raise ValueError(f"Backtest needs more than {min_train + 1} candles, got {n_candles}")
+
+    folds = []
+    # The last candle has nothing after it to score a forecast against
+    for cutoff in range(min_train, n_candles, step):
+        train_start = max(0, cutoff - window_size) if window == "rolling" else 0
+        folds.append((train_start, cutoff, min(cutoff - 1 + step, n_candles - 1)))
+    if len(folds) > BACKTEST_MAX_FOLDS:
+        raise ValueError(f"Backtest would fit {len(folds)} folds, at most {BACKTEST_MAX_FOLDS} are allowed, use a larger step or fewer candles")
+    return folds
+
+
+def run_fold(model_name: str, strategy: str, horizon: int, history: pd.DataFrame, train_start: int, cutoff: int) -> Dict[str, Any]:
+    """Fit a model on candles [train_start, cutoff) of ``history`` and forecast ``horizon`` closes
+    from each candle from cutoff - 1 on, runs in a training worker.
+
+    ``history`` ends at the fold's last origin, so no candle a forecast is
+    scored against can leak into it. Returns predictions shaped (origins, horizon).
+    """
+    started = time.perf_counter()
+    origins = np.arange(cutoff - 1, len(history))
+
+    if model_name == "prophet":
+        df_p = history.iloc[train_start:cutoff][["timestamp", "close"]].rename(columns={"timestamp": "ds", "close": "y"})
+        model, _ = fit_prophet_model(df_p)
+        # One predict over every date any origin forecasts, Prophet's forecast of a date does not depend on the origin
+        dates = pd.date_range(start=history["timestamp"].iloc[cutoff - 1] + pd.Timedelta(days=1), periods=len(origins) - 1 + horizon)
+        yhat = model.predict(pd.DataFrame({"ds": dates}))["yhat"].to_numpy()
+        preds = yhat[origins[:, None] - cutoff + np.arange(1, horizon + 1)]
+    else:
+        pipeline = FeaturePipeline()
+        data = prepare_training_data(history.iloc[train_start:cutoff], pipeline)
+        # Feature rows of every origin at once, forecasts advance all of them together
+        state = BatchRollingState(pipeline, history, origins)
+        if strategy == "direct":
+            model = make_multi_output_model(model_name, FIT_THREADS).fit(*data["direct"])
+            preds = make_predictor(model)(state.row).reshape(len(origins), -1)[:, :horizon]
+        else:
+            models = {
+                "features": make_multi_output_model(model_name, FIT_THREADS).fit(*data["features"]),
+                "close": make_close_model(model_name, FIT_THREADS).fit(*data["close"]),
+            }
+            preds = batch_forecast(models, state, horizon)
+
+    return {"origins": origins, "predictions": preds, "seconds": time.perf_counter() - started}
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 6)
+
+
+def run_backtest(df: pd.DataFrame, model_name: str, horizon: int = MAX_HORIZON, strategy: str = "recursive",
+                 window: str = "expanding", window_size: Optional[int] = None, min_train: int = 365,
+                 step: int = 30) -> Dict[str, Any]:
+    """Walk-forward backtest of one model type over a candle history.
+
+    Folds (see walk_forward_folds) are fitted in parallel in the training
+    pool, at most BACKTEST_FOLDS_IN_FLIGHT at a time. Every forecast is scored against the actual close, errors are
+    aggregated per horizon into MAE, RMSE and MAPE curves, next to the MAE of
+    the naive forecast that repeats the origin's close.
+    """
+    if model_name not in MODEL_NAMES:
+        raise ValueError(f"Model {model_name} not supported")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown forecasting strategy {strategy}")
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"Backtest horizon must be between 1 and {MAX_HORIZON}")
+    if model_name == "prophet":
+        strategy = "recursive"
+
+    started = time.perf_counter()
+    df = df.dropna(subset=CANDLE_FEATURES).sort_values("timestamp").reset_index(drop=True)
+    folds = walk_forward_folds(len(df), min_train, step, window, window_size)
+    # Only a few folds wait in the training pool at once, the rest are submitted as those finish
+    results: List[Optional[Dict[str, Any]]] = [None] * len(folds)
+    pending = {}
+    for i, (train_start, cutoff, origin_end) in enumerate(folds):
+        if len(pending) >= BACKTEST_FOLDS_IN_FLIGHT:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+        future = submit_training(run_fold, model_name, strategy, horizon, df.iloc[:origin_end][["timestamp"] + CANDLE_FEATURES], train_start, cutoff)
+        pending[future] = i
+    for future, i in pending.items():
+        results[i] = future.result()
+
+    # Actual closes of every origin and horizon, NaN past the end of the history
+    closes = df["close"].to_numpy(dtype=np.float64)
+    padded = np.concatenate([closes, np.full(horizon, np.nan)])
+    offsets = np.arange(1, horizon + 1)
+    origins = np.concatenate([result["origins"] for result in results])
+    predictions = np.concatenate([result["predictions"] for result in results])
+    actual = padded[origins[:, None] + offsets]
+    errors = predictions - actual
+    naive_errors = closes[origins][:, None] - actual
+
+    # Horizons without scored forecasts average an empty slice into NaN
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        counts = np.sum(~np.isnan(errors), axis=0)
+        mae = np.nanmean(np.abs(errors), axis=0)
+        rmse = np.sqrt(np.nanmean(errors ** 2, axis=0))
+        mape = np.nanmean(np.abs(errors / actual), axis=0) * 100
+        naive_mae = np.nanmean(np.abs(naive_errors), axis=0)
+
+    timestamps = df["timestamp"]
+    summary = []
+    position = 0
+    for i, ((train_start, cutoff, _), result) in enumerate(zip(folds, results)):
+        n_origins = len(result["origins"])
+        fold_errors = errors[position:position + n_origins]
+        position += n_origins
+        summary.append({
+            "fold": i,
+            "train_start": timestamps.iloc[train_start].isoformat(),
+            "train_end": timestamps.iloc[cutoff - 1].isoformat(),
+            "origins": n_origins,
+            "mae": _nan_to_none(np.nanmean(np.abs(fold_errors))),
+            "seconds": round(result["seconds"], 3),
+        })
+
+    seconds = round(time.perf_counter() - started, 3)
+    logger.info(f"Backtested {model_name} ({strategy}, {window} window) over {len(folds)} folds in {seconds:.2f}s")
+    return {
+        "model_type": model_name,
+        "strategy": strategy,
+        "window": window,
+        "window_size": (window_size or min_train) if window == "rolling" else None,
+        "min_train": min_train,
+        "step": step,
+        "horizon": horizon,
+        "candles": len(df),
+        "start": timestamps.iloc[0].isoformat(),
+        "end": timestamps.iloc[-1].isoformat(),
+        "mae": _nan_to_none(np.nanmean(np.abs(errors))),
+        "naive_mae": _nan_to_none(np.nanmean(np.abs(naive_errors))),
+        "horizons": [
+            {
+                "horizon": h,
+                "mae": _nan_to_none(mae[h - 1]),
+                "rmse": _nan_to_none(rmse[h - 1]),
+                "mape": _nan_to_none(mape[h - 1]),
+                "naive_mae": _nan_to_none(naive_mae[h - 1]),
+                "count": int(counts[h - 1]),
+            }
+            for h in range(1, horizon + 1)
+        ],
+        "folds": summary,
+        "seconds": seconds,
+        "workers": max(TRAINING_WORKERS, 0),
+    }
+
+
+def _format_error(value: Optional[float], width: int) -> str:
+    # Horizons without scored forecasts have no error
+    return f"{'n/a':>{width}}" if value is None else f"{value:>{width}.2f}"
+
+
+def cached_backtest(df: pd.DataFrame, crypto: str, model_name: str, **params) -> Dict[str, Any]:
+    """run_backtest, reusing the result of the same backtest over the same candles."""
+    key = (crypto, model_name, tuple(sorted(params.items())), len(df), df["timestamp"].iat[-1])
+    return backtest_cache.get_or_load(key, lambda: run_backtest(df, model_name, **params))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of a model type over the candle history")
+    parser.add_argument("--crypto", default="btc")
+    parser.add_argument("--model-type", default="random_forest", choices=MODEL_NAMES)
+    parser.add_argument("--horizon", type=int, default=MAX_HORIZON)
+    parser.add_argument("--strategy", default="recursive", choices=STRATEGIES)
+    parser.add_argument("--window", default="expanding", choices=WINDOWS)
+    parser.add_argument("--window-size", type=int, default=None, help="training candles of a rolling window, --min-train by default")
+    parser.add_argument("--min-train", type=int, default=365, help="training candles of the first fold")
+    parser.add_argument("--step", type=int, default=30, help="candles between fold cutoffs")
+    parser.add_argument("--days", type=int, default=1000, help="candles of history to backtest over")
+    parser.add_argument("--json", action="store_true", help="print the whole result as JSON")
+    args = parser.parse_args()
+
+    from .market_data import get_historical_data
+
+    df = get_historical_data(f"{args.crypto.lower()}usdt", days=args.days)
+    result = run_backtest(
+        df, args.model_type, horizon=args.horizon, strategy=args.strategy, window=args.window,
+        window_size=args.window_size, min_train=args.min_train, step=args.step,
+    )
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+
+    print(
+        f"{args.crypto.upper()} {result['model_type']} ({result['strategy']}, {result['window']} window): "
+        f"{len(result['folds'])} folds over {result['candles']} candles in {result['seconds']:.1f}s"
+    )
+    print(f"{'horizon':>8}{'MAE':>12}{'RMSE':>12}{'MAPE, %':>10}{'naive MAE':>12}{'count':>8}")
+    for row in result["horizons"]:
+        print(
+            f"{row['horizon']:>8}{_format_error(row['mae'], 12)}{_format_error(row['rmse'], 12)}{_format_error(row['mape'], 10)}"
+            f"{_format_error(row['naive_mae'], 12)}{row['count']:>8}"
+        )
+    print(f"{'all':>8}{_format_error(result['mae'], 12)}{'':>22}{_format_error(result['naive_mae'], 12)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# ml_service/app/candle_store.py
+import os
+import json
+import shutil
+import logging
+import threading
+from typing import Dict, Optional, Any
+
+import numpy as np
+
+
+logger = logging.getLogger("ml-service")
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume", "turnover"]
+CANDLE_COLUMNS = ["timestamp"] + PRICE_COLUMNS
+
+# Timestamps are kept as int64 milliseconds, prices/volumes as float64
+COLUMN_DTYPES = {column: np.float64 for column in PRICE_COLUMNS}
+COLUMN_DTYPES["timestamp"] = np.int64
+ITEM_SIZE = 8
+
+# Bybit kline intervals in milliseconds ("M" is calendar based and is not supported)
+INTERVAL_MS = {
+    "1": 60_000,
+    "3": 3 * 60_000,
+    "5": 5 * 60_000,
+    "15": 15 * 60_000,
+    "30": 30 * 60_000,
+    "60": 60 * 60_000,
+    "120": 120 * 60_000,
+    "240": 240 * 60_000,
+    "360": 360 * 60_000,
+    "720": 720 * 60_000,
+    "D": 86_400_000,
+    "W": 7 * 86_400_000,
+}
+
+# Weekly candles open on Monday, the epoch was a Thursday
+INTERVAL_OFFSET_MS = {"W": 4 * 86_400_000}
+
+
+def interval_to_ms(interval: str) -> int:
+    try:
+        return INTERVAL_MS[str(interval)]
+    except KeyError:
+        raise ValueError(f"Unsupported candle interval: {interval}")
+
+
+def candle_open_time(ts_ms: int, interval: str) -> int:
+    """Open time of the candle that contains ``ts_ms``."""
+    step = interval_to_ms(interval)
+    offset = INTERVAL_OFFSET_MS.get(str(interval), 0)
+    return (ts_ms - offset) // step * step + offset
+
+
+def last_closed_open_time(now_ms: int, interval: str) -> int:
+    """Open time of the most recent candle that has already closed at ``now_ms``."""
+    return candle_open_time(now_ms, interval) - interval_to_ms(interval)
+
+
+class CandleStore:
+    """Append-only columnar store of closed OHLCV candles.
+
+    Every (symbol, interval) series is a directory with one raw binary file
+    per column, so new candles are appended without rewriting history and
+    reads memory-map only the tail that is actually requested.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks: Dict[tuple, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), str(interval))
+
+    def _column_path(self, symbol: str, interval: str, column: str) -> str:
+        return os.path.join(self._series_dir(symbol, interval), f"{column}.bin")
+
+    def _meta_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self._series_dir(symbol, interval), "meta.json")
+
+    def lock(self, symbol: str, interval: str) -> threading.RLock:
+        key = (symbol.upper(), str(interval))
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    def count(self, symbol: str, interval: str) -> int:
+        # A torn append may leave columns with different lengths,
+        # only rows present in every column are considered stored
+        sizes = []
+        for column in CANDLE_COLUMNS:
+            path = self._column_path(symbol, interval, column)
+            if not os.path.exists(path):
+                return 0
+            sizes.append(os.path.getsize(path) // ITEM_SIZE)
+        return min(sizes)
+
+    def _timestamp_at(self, symbol: str, interval: str, index: int) -> int:
+        path = self._column_path(symbol, interval, "timestamp")
+        return int(np.fromfile(path, dtype=np.int64, count=1, offset=index * ITEM_SIZE)[0])
+
+    def first_timestamp(self, symbol: str, interval: str) -> Optional[int]:
+        with self.lock(symbol, interval):
+            if self.count(symbol, interval) == 0:
+                return None
+            return self._timestamp_at(symbol, interval, 0)
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[int]:
+        with self.lock(symbol, interval):
+            n = self.count(symbol, interval)
+            if n == 0:
+                return None
+            return self._timestamp_at(symbol, interval, n - 1)
+
+    def read(self, symbol: str, interval: str, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Return the last ``limit`` candles (all of them if ``limit`` is None) as column arrays."""
+        with self.lock(symbol, interval):
+            n = self.count(symbol, interval)
+            start = max(n - limit, 0) if limit is not None else 0
+            columns = {}
+            for column in CANDLE_COLUMNS:
+                dtype = COLUMN_DTYPES[column]
+                if n == start:
+                    columns[column] = np.empty(0, dtype=dtype)
+                    continue
+                mapped = np.memmap(
+                    self._column_path(symbol, interval, column),
+                    dtype=dtype,
+                    mode="r",
+                    offset=start * ITEM_SIZE,
+                    shape=(n - start,),
+                )
+                # Copy out of the mapping so callers never hold a view on a file we may repair
+                columns[column] = np.array(mapped)
+                del mapped
+            return columns
+
+    def append(self, symbol: str, interval: str, candles: Dict[str, Any]) -> int:
+        """Append candles newer than the last stored one, returns the number of rows written."""
+        with self.lock(symbol, interval):
+            os.makedirs(self._series_dir(symbol, interval), exist_ok=True)
+            n = self._repair(symbol, interval)
+            last_ts = self._timestamp_at(symbol, interval, n - 1) if n else None
+
+            columns = _normalize(candles)
+            if last_ts is not None:
+                mask = columns["timestamp"] > last_ts
+                columns = {column: values[mask] for column, values in columns.items()}
+
+            rows = len(columns["timestamp"])
+            if rows == 0:
+                return 0
+
+            for column in CANDLE_COLUMNS:
+                with open(self._column_path(symbol, interval, column), "ab") as f:
+                    f.write(columns[column].tobytes())
+            return rows
+
+    def merge(self, symbol: str, interval: str, candles: Dict[str, Any]) -> int:
+        """Merge candles anywhere in the series (e.g. older history) by rewriting it.
+
+        Slower than :meth:`append`, only meant for backfilling history that
+        starts before the first stored candle.
+        """
+        with self.lock(symbol, interval):
+            existing = self.read(symbol, interval)
+            incoming = _normalize(candles)
+            merged = {
+                column: np.concatenate([incoming[column], existing[column]])
+                for column in CANDLE_COLUMNS
+            }
+            merged = _normalize(merged)
+
+            series_dir = self._series_dir(symbol, interval)
+            tmp_dir = series_dir + ".tmp"
+            old_dir = series_dir + ".old"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            for column in CANDLE_COLUMNS:
+                with open(os.path.join(tmp_dir, f"{column}.bin"), "wb") as f:
+                    f.write(merged[column].tobytes())
+            meta_path = self._meta_path(symbol, interval)
+            if os.path.exists(meta_path):
+                shutil.copy2(meta_path, os.path.join(tmp_dir, "meta.json"))
+
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(series_dir):
+                os.rename(series_dir, old_dir)
+            os.rename(tmp_dir, series_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+            return len(merged["timestamp"]) - len(existing["timestamp"])
+
+    def get_meta(self, symbol: str, interval: str) -> Dict[str, Any]:
+        path = self._meta_path(symbol, interval)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading candle store meta {path}: {e}")
+            return {}
+
+    def set_meta(self, symbol: str, interval: str, **values):
+        with self.lock(symbol, interval):
+            meta = self.get_meta(symbol, interval)
+            meta.update(values)
+            os.makedirs(self._series_dir(symbol, interval), exist_ok=True)
+            path = self._meta_path(symbol, interval)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, path)
+
+    def _repair(self, symbol: str, interval: str) -> int:
+        # Truncate every column to the common length left by an interrupted append
+        n = self.count(symbol, interval)
+        for column in CANDLE_COLUMNS:
+            path = self._column_path(symbol, interval, column)
+            if os.path.exists(path) and os.path.getsize(path) != n * ITEM_SIZE:
+                logger.warning(f"Truncating torn candle column {path} to {n} rows")
+                os.truncate(path, n * ITEM_SIZE)
+            elif not os.path.exists(path):
+                open(path, "wb").close()
+        return n
+
+
+def _normalize(candles: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    # Cast to storage dtypes, sort by timestamp and drop duplicate timestamps
+    columns = {
+        column: np.ascontiguousarray(candles[column], dtype=COLUMN_DTYPES[column])
+        for column in CANDLE_COLUMNS
+    }
+    _, index = np.unique(columns["timestamp"], return_index=True)
+    return {column: values[index] for column, values in columns.items()}
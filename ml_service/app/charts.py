@@ -0,0 +1,80 @@
+# ml_service/app/charts.py
+import io
+import hashlib
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import CHART_CACHE_SIZE
+from .cache import TTLCache
+
+
+logger = logging.getLogger("ml-service")
+
+# Data a chart is drawn from, keyed by chart id. Registering is cheap, the
+# image is only rendered once somebody asks for it.
+chart_sources = TTLCache("chart_sources", maxsize=CHART_CACHE_SIZE)
+# Rendered PNGs keyed by chart id
+chart_cache = TTLCache("charts", maxsize=CHART_CACHE_SIZE)
+
+
+def chart_id(crypto: str, model_type: str, historical_data: pd.DataFrame, forecast_data: pd.DataFrame) -> str:
+    """Content hash of everything drawn on the chart, equal inputs always map to the same id."""
+    digest = hashlib.sha256(f"{crypto}:{model_type}".encode())
+    for values in (
+        historical_data["timestamp"].to_numpy(dtype="datetime64[ns]"),
+        historical_data["close"].to_numpy(dtype=np.float64),
+        forecast_data["timestamp"].to_numpy(dtype="datetime64[ns]"),
+        forecast_data["predicted_close"].to_numpy(dtype=np.float64),
+    ):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def render_prediction_chart(historical_data: pd.DataFrame, forecast_data: pd.DataFrame, symbol: str) -> bytes:
+    """Draw history and forecast into a PNG.
+
+    Uses a standalone Figure with its own Agg canvas instead of pyplot, so
+    there is no global state and any number of threads can render at once.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(12, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    # Plot historical data
+    ax.plot(historical_data["timestamp"], historical_data["close"], label="Historical Price")
+
+    # Plot forecast data
+    ax.plot(forecast_data["timestamp"], forecast_data["predicted_close"], label="Forecast", color="red")
+
+    ax.set_xlabel("Date")
+    ax.set_ylabel(f"Price {symbol.upper()}/USDT")
+    ax.set_title(f"Price Forecast for {symbol.upper()}/USDT")
+    ax.legend()
+    ax.grid(True)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def register_chart(crypto: str, model_type: str, historical_data: pd.DataFrame, forecast_data: pd.DataFrame) -> str:
+    """Remember what a chart shows and return its id, nothing is rendered yet."""
+    key = chart_id(crypto, model_type, historical_data, forecast_data)
+    if chart_sources.get(key) is None:
+        chart_sources.set(key, (crypto, historical_data.copy(), forecast_data.copy()))
+    return key
+
+
+def get_chart(key: str) -> Optional[bytes]:
+    """PNG of a registered chart, rendered at most once per id. None if the id is unknown or evicted."""
+    source = chart_sources.get(key)
+    if source is None:
+        return chart_cache.get(key)
+    crypto, historical_data, forecast_data = source
+    return chart_cache.get_or_load(key, lambda: render_prediction_chart(historical_data, forecast_data, crypto))
@@ -0,0 +1,103 @@
+# ml_service/app/config.py
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Define base paths, models and data can be kept elsewhere (e.g. a scratch directory in tests)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.environ.get("ML_MODELS_DIR") or os.path.join(BASE_DIR, "models")
+DATA_DIR = os.environ.get("ML_DATA_DIR") or os.path.join(BASE_DIR, "data")
+TRAINING_INFO_FILE = os.path.join(MODELS_DIR, "training_info.json")
+
+# Local candle store (one directory per symbol/interval)
+CANDLES_DIR = os.path.join(DATA_DIR, "candles")
+
+# Make sure directories exist
+os.makedirs(MODELS_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+os.makedirs(CANDLES_DIR, exist_ok=True)
+
+# Bybit kline backfill: page size is the exchange maximum per request
+KLINE_PAGE_LIMIT = 1000
+BACKFILL_WORKERS = _env_int("ML_BACKFILL_WORKERS", 4)
+
+# Shared Bybit client. The base URL defaults to the pybit mainnet endpoint and
+# can point at a local stub server instead.
+BYBIT_BASE_URL = os.environ.get("ML_BYBIT_BASE_URL") or None
+BYBIT_REQUESTS_PER_SECOND = _env_float("ML_BYBIT_REQUESTS_PER_SECOND", 10.0)
+BYBIT_TIMEOUT_SECONDS = _env_float("ML_BYBIT_TIMEOUT_SECONDS", 10.0)
+# Keep-alive connections kept open to the exchange
+BYBIT_POOL_SIZE = _env_int("ML_BYBIT_POOL_SIZE", 16)
+# Attempts per request, retries back off exponentially with full jitter
+BYBIT_MAX_ATTEMPTS = _env_int("ML_BYBIT_MAX_ATTEMPTS", 3)
+BYBIT_BACKOFF_SECONDS = _env_float("ML_BYBIT_BACKOFF_SECONDS", 0.5)
+# After this many failed requests in a row the exchange is not called for BYBIT_BREAKER_RESET_SECONDS
+BYBIT_BREAKER_THRESHOLD = _env_int("ML_BYBIT_BREAKER_THRESHOLD", 5)
+BYBIT_BREAKER_RESET_SECONDS = _env_float("ML_BYBIT_BREAKER_RESET_SECONDS", 30.0)
+
+# In-process cache of prepared history frames keyed by (symbol, interval, window)
+DATA_CACHE_SIZE = _env_int("ML_DATA_CACHE_SIZE", 64)
+# Entries expire when the next candle closes, plus a grace period for the exchange to publish it
+CANDLE_CLOSE_GRACE_SECONDS = _env_float("ML_CANDLE_CLOSE_GRACE_SECONDS", 5.0)
+# Retry delay when the exchange has not published the latest closed candle yet
+CANDLE_RETRY_SECONDS = _env_float("ML_CANDLE_RETRY_SECONDS", 30.0)
+
+# Cached full-horizon forecasts, least recently used entries are evicted first
+FORECAST_CACHE_SIZE = _env_int("ML_FORECAST_CACHE_SIZE", 256)
+
+# Models older than this keep serving while a background retrain replaces them
+MODEL_MAX_AGE_HOURS = _env_float("ML_MODEL_MAX_AGE_HOURS", 24.0)
+RETRAIN_WORKERS = _env_int("ML_RETRAIN_WORKERS", 1)
+# A pair whose training failed is not retrained for a stale or missing model again within this many minutes
+RETRAIN_BACKOFF_MINUTES = _env_float("ML_RETRAIN_BACKOFF_MINUTES", 15.0)
+
+# Models are loaded on first use, past this many MB in memory the least recently used ones are dropped (0: no limit)
+MODEL_MEMORY_BUDGET_MB = _env_float("ML_MODEL_MEMORY_BUDGET_MB", 1024.0)
+# Published versions kept on disk per model, older ones can be rolled back to instantly
+MODEL_KEEP_VERSIONS = _env_int("ML_MODEL_KEEP_VERSIONS", 3)
+
+# Prophet forecasts only serve yhat, 0 skips sampling the uncertainty intervals (Prophet's default is 1000)
+PROPHET_UNCERTAINTY_SAMPLES = _env_int("ML_PROPHET_UNCERTAINTY_SAMPLES", 0)
+# Prophet refits start from the previous fit's parameters if their histories overlap at least this much
+PROPHET_WARM_START_MIN_OVERLAP = _env_float("ML_PROPHET_WARM_START_MIN_OVERLAP", 0.75)
+
+# Process pool for fitting estimators in parallel, 0 fits them inline in the calling thread
+TRAINING_WORKERS = _env_int("ML_TRAINING_WORKERS", min(4, os.cpu_count() or 1))
+
+# Walk-forward backtests running at once, each spreads its folds over the training pool
+BACKTEST_WORKERS = _env_int("ML_BACKTEST_WORKERS", 1)
+# Most folds one backtest may have, a smaller step over a longer history is rejected
+BACKTEST_MAX_FOLDS = _env_int("ML_BACKTEST_MAX_FOLDS", 100)
+# Folds of one backtest queued in the training pool at once, so retrains and cold predictions get workers in between
+BACKTEST_FOLDS_IN_FLIGHT = _env_int("ML_BACKTEST_FOLDS_IN_FLIGHT", max(TRAINING_WORKERS // 2, 1))
+# Cached backtest results, keyed by their parameters and the last candle
+BACKTEST_CACHE_SIZE = _env_int("ML_BACKTEST_CACHE_SIZE", 32)
+
+# Executors the async endpoints hand blocking work to, so the event loop only serves requests.
+# I/O covers exchange calls and candle store reads, CPU covers forecasting.
+IO_WORKERS = _env_int("ML_IO_WORKERS", 8)
+CPU_WORKERS = _env_int("ML_CPU_WORKERS", min(4, os.cpu_count() or 1))
+
+# Prediction charts: rendered on demand in their own pool and cached by content
+CHART_WORKERS = _env_int("ML_CHART_WORKERS", 2)
+CHART_CACHE_SIZE = _env_int("ML_CHART_CACHE_SIZE", 128)
+
+# Last traded prices are cached this long and refreshed in the background before they expire
+TICKER_TTL_SECONDS = _env_float("ML_TICKER_TTL_SECONDS", 10.0)
+TICKER_REFRESH_SECONDS = _env_float("ML_TICKER_REFRESH_SECONDS", 5.0)
+
+# Most items accepted by one /predict/batch call
+PREDICT_BATCH_MAX_ITEMS = _env_int("ML_PREDICT_BATCH_MAX_ITEMS", 100)
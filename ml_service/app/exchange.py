@@ -0,0 +1,202 @@
+# ml_service/app/exchange.py
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from pybit.unified_trading import HTTP
+from pybit.exceptions import FailedRequestError, InvalidRequestError
+
+from .config import (
+    BACKFILL_WORKERS,
+    BYBIT_BASE_URL,
+    BYBIT_REQUESTS_PER_SECOND,
+    BYBIT_TIMEOUT_SECONDS,
+    BYBIT_POOL_SIZE,
+    BYBIT_MAX_ATTEMPTS,
+    BYBIT_BACKOFF_SECONDS,
+    BYBIT_BREAKER_THRESHOLD,
+    BYBIT_BREAKER_RESET_SECONDS,
+)
+
+
+logger = logging.getLogger("ml-service")
+
+
+class ExchangeError(Exception):
+    """The exchange rejected a request, retrying it would not help."""
+
+
+class ExchangeUnavailable(ExchangeError):
+    """The exchange could not be reached, or the circuit breaker is open."""
+
+
+class RateLimiter:
+    """Thread-safe token bucket: ``rate`` requests per second with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stop calling a failing dependency for a while.
+
+    ``threshold`` consecutive failures open the breaker. Once ``reset_seconds``
+    have passed one probe request is let through (half-open): success closes
+    the breaker again, failure keeps it open for another period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = max(threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Let exactly one probe through, everyone else keeps failing fast
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Bybit circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        f"Bybit circuit breaker opened after {self.failures} failure(s), "
+                        f"retrying in {self.reset_seconds:g}s"
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.times_opened}
+
+
+class BybitClient:
+    """Bybit market data client shared by the whole service.
+
+    One pybit session with a pooled keep-alive connection adapter serves every
+    thread. Each request waits for a rate limiter token, transient failures are
+    retried with exponential backoff and full jitter, and a circuit breaker
+    fails fast with :class:`ExchangeUnavailable` while the exchange is down.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = BYBIT_BASE_URL,
+        rate: float = BYBIT_REQUESTS_PER_SECOND,
+        burst: int = BACKFILL_WORKERS,
+        timeout: float = BYBIT_TIMEOUT_SECONDS,
+        pool_size: int = BYBIT_POOL_SIZE,
+        max_attempts: int = BYBIT_MAX_ATTEMPTS,
+        backoff: float = BYBIT_BACKOFF_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        # Retries are ours, pybit only makes single attempts
+        self.session = HTTP(testnet=False, timeout=timeout, max_retries=1, retry_delay=0)
+        if base_url:
+            self.session.endpoint = base_url.rstrip("/")
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+        self.session.client.mount("https://", adapter)
+        self.session.client.mount("http://", adapter)
+
+        self.limiter = RateLimiter(rate, burst=burst)
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(BYBIT_BREAKER_THRESHOLD, BYBIT_BREAKER_RESET_SECONDS)
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _call(self, method: Callable[..., Dict[str, Any]], **params) -> Dict[str, Any]:
+        name = method.__name__
+        for attempt in range(self.max_attempts):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise ExchangeUnavailable(f"Bybit circuit breaker is open, {name} not sent")
+            self.limiter.acquire()
+            self.requests += 1
+            try:
+                response = method(**params)
+            except InvalidRequestError as e:
+                # Bybit answered, the request itself is wrong
+                self.breaker.record_success()
+                raise ExchangeError(f"Bybit API error: {e.message}") from e
+            except (FailedRequestError, requests.RequestException) as e:
+                self.breaker.record_failure()
+                if attempt + 1 == self.max_attempts:
+                    raise ExchangeUnavailable(f"Bybit {name} failed after {self.max_attempts} attempt(s): {e}") from e
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                logger.warning(f"Bybit {name} failed ({e}), retrying in {delay:.2f}s")
+                self.retries += 1
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return response
+
+    def get_kline(self, symbol: str, interval: str, start: int, end: int, limit: int) -> Dict[str, Any]:
+        return self._call(
+            self.session.get_kline,
+            category="linear", symbol=symbol, interval=interval, start=start, end=end, limit=limit,
+        )
+
+    def get_tickers(self, symbol: Optional[str] = None) -> Dict[str, Any]:
+        params = {"category": "linear"}
+        if symbol is not None:
+            params["symbol"] = symbol
+        return self._call(self.session.get_tickers, **params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rejected_by_breaker": self.rejected,
+            "breaker": self.breaker.stats(),
+        }
+
+
+# The one client every module talks to Bybit through
+bybit = BybitClient()
@@ -0,0 +1,34 @@
+# ml_service/app/executors.py
+import asyncio
+from functools import partial
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from .config import IO_WORKERS, CPU_WORKERS, CHART_WORKERS
+
+
+# Blocking network and disk calls
+io_executor = ThreadPoolExecutor(max_workers=max(1, IO_WORKERS), thread_name_prefix="io")
+# Forecasting. NumPy and the tree predictors release the GIL for most of their
+# work, model fitting goes to the training process pool.
+cpu_executor = ThreadPoolExecutor(max_workers=max(1, CPU_WORKERS), thread_name_prefix="cpu")
+# Chart rendering, kept apart so slow renders never queue ahead of forecasts
+chart_executor = ThreadPoolExecutor(max_workers=max(1, CHART_WORKERS), thread_name_prefix="chart")
+
+
+async def run_in(executor: Executor, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await ``func(*args, **kwargs)`` running in ``executor`` without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+async def run_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    return await run_in(io_executor, func, *args, **kwargs)
+
+
+async def run_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    return await run_in(cpu_executor, func, *args, **kwargs)
+
+
+async def run_chart(func: Callable[..., Any], *args, **kwargs) -> Any:
+    return await run_in(chart_executor, func, *args, **kwargs)
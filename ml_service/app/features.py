@@ -0,0 +1,147 @@
+# ml_service/app/features.py
+import math
+from typing import Any, Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# Candle columns, the first columns of every feature row and what the models predict
+CANDLE_FEATURES = ["open", "high", "low", "close", "volume", "turnover"]
+
+_CLOSE = CANDLE_FEATURES.index("close")
+_HIGH = CANDLE_FEATURES.index("high")
+_LOW = CANDLE_FEATURES.index("low")
+
+
+class FeaturePipeline:
+    """Model inputs derived from daily candles, the same for training and serving.
+
+    A feature row holds the candle followed by
+
+    - ``close_lag_k``: the close k days earlier,
+    - ``return_k``: the close over the close k days earlier, minus 1,
+    - ``rolling_mean_w``: the mean close of the last w days,
+    - ``volatility_w``: the standard deviation (ddof=1) of the last w daily returns,
+    - ``range``: (high - low) / close.
+
+    ``transform`` computes every row of a history at once with pandas rolling
+    windows. ``rolling_state`` picks up at the end of a history and advances
+    one candle at a time in O(1), for recursive forecasts. The first
+    ``warmup`` rows of a history lack the data for some features and are NaN.
+    """
+
+    def __init__(self, lags: Sequence[int] = (1, 2, 3, 7), returns: Sequence[int] = (1, 7), windows: Sequence[int] = (7, 30)):
+        self.lags = [int(k) for k in lags]
+        self.returns = [int(k) for k in returns]
+        self.windows = [int(w) for w in windows]
+        if min(self.windows) < 2:
+            raise ValueError("Rolling windows need at least 2 days for a volatility")
+        self.names = (
+            CANDLE_FEATURES
+            + [f"close_lag_{k}" for k in self.lags]
+            + [f"return_{k}" for k in self.returns]
+            + [f"rolling_mean_{w}" for w in self.windows]
+            + [f"volatility_{w}" for w in self.windows]
+            + ["range"]
+        )
+        # A w-day volatility needs w daily returns, i.e. w + 1 closes
+        self.warmup = max(self.lags + self.returns + self.windows)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self) -> str:
+        return f"FeaturePipeline(lags={self.lags}, returns={self.returns}, windows={self.windows})"
+
+    def to_config(self) -> Dict[str, Any]:
+        return {"lags": self.lags, "returns": self.returns, "windows": self.windows}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "FeaturePipeline":
+        return cls(config["lags"], config["returns"], config["windows"])
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Feature rows of every candle of ``df`` (sorted by time), shaped (len(df), len(self))."""
+        close = df["close"].astype(np.float64)
+        daily_returns = close / close.shift(1) - 1
+        columns = [df[column].to_numpy(dtype=np.float64) for column in CANDLE_FEATURES]
+        columns += [close.shift(k).to_numpy() for k in self.lags]
+        columns += [(close / close.shift(k) - 1).to_numpy() for k in self.returns]
+        columns += [close.rolling(w).mean().to_numpy() for w in self.windows]
+        columns += [daily_returns.rolling(w).std().to_numpy() for w in self.windows]
+        columns.append(((df["high"] - df["low"]) / close).to_numpy(dtype=np.float64))
+        return np.column_stack(columns)
+
+    def rolling_state(self, df: pd.DataFrame) -> "RollingState":
+        """State at the last candle of ``df``, its row equals the last row of ``transform(df)``."""
+        if len(df) <= self.warmup:
+            raise ValueError(f"Feature pipeline needs more than {self.warmup} candles, got {len(df)}")
+        tail = df.tail(self.warmup + 1)
+        return RollingState(self, tail["close"].to_numpy(dtype=np.float64), tail[CANDLE_FEATURES].to_numpy(dtype=np.float64)[-1])
+
+
+class RollingState:
+    """Feature row of the latest candle, advanced by pushing the next candle.
+
+    The last closes and daily returns sit in ring buffers next to running sums
+    over every window, so a push costs the same however long the history is.
+    ``row`` is a (1, n_features) array updated in place.
+    """
+
+    def __init__(self, pipeline: FeaturePipeline, closes: np.ndarray, candle: np.ndarray):
+        self.pipeline = pipeline
+        # Oldest first, closes[-1] is the latest candle's close
+        self._closes = [float(close) for close in closes]
+        self._close_head = len(self._closes) - 1
+        returns = closes[1:] / closes[:-1] - 1
+        self._returns = [float(r) for r in returns[-max(pipeline.windows):]]
+        self._return_head = len(self._returns) - 1
+        self._close_sums = [float(np.sum(closes[-w:])) for w in pipeline.windows]
+        self._return_sums = [float(np.sum(returns[-w:])) for w in pipeline.windows]
+        self._return_squares = [float(np.sum(returns[-w:] ** 2)) for w in pipeline.windows]
+        self.row = np.empty((1, len(pipeline)), dtype=np.float64)
+        self._fill(candle)
+
+    def _close(self, k: int) -> float:
+        # Close k days before the latest candle
+        return self._closes[(self._close_head - k) % len(self._closes)]
+
+    def _return(self, k: int) -> float:
+        return self._returns[(self._return_head - k) % len(self._returns)]
+
+    def push(self, candle: Sequence[float]):
+        """Advance to the next candle, given as values of CANDLE_FEATURES."""
+        close = float(candle[_CLOSE])
+        daily_return = close / self._close(0) - 1
+        # The value dropping out of a w-day window is the one w - 1 days before the current latest
+        for i, w in enumerate(self.pipeline.windows):
+            self._close_sums[i] += close - self._close(w - 1)
+            leaving = self._return(w - 1)
+            self._return_sums[i] += daily_return - leaving
+            self._return_squares[i] += daily_return * daily_return - leaving * leaving
+        self._close_head = (self._close_head + 1) % len(self._closes)
+        self._closes[self._close_head] = close
+        self._return_head = (self._return_head + 1) % len(self._returns)
+        self._returns[self._return_head] = daily_return
+        self._fill(candle)
+
+    def _fill(self, candle: Sequence[float]):
+        pipeline = self.pipeline
+        row = self.row[0]
+        close = float(candle[_CLOSE])
+        row[:len(CANDLE_FEATURES)] = candle
+        i = len(CANDLE_FEATURES)
+        for k in pipeline.lags:
+            row[i] = self._close(k)
+            i += 1
+        for k in pipeline.returns:
+            row[i] = close / self._close(k) - 1
+            i += 1
+        for total, w in zip(self._close_sums, pipeline.windows):
+            row[i] = total / w
+            i += 1
+        for total, squares, w in zip(self._return_sums, self._return_squares, pipeline.windows):
+            row[i] = math.sqrt(max((squares - total * total / w) / (w - 1), 0.0))
+            i += 1
+        row[i] = (float(candle[_HIGH]) - float(candle[_LOW])) / close
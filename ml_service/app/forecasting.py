@@ -0,0 +1,205 @@
+# ml_service/app/forecasting.py
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import FORECAST_CACHE_SIZE
+from .cache import TTLCache
+from .features import CANDLE_FEATURES
+
+
+logger = logging.getLogger("ml-service")
+
+# Candle columns: the whole input of bundles trained without a feature pipeline,
+# the first columns of every pipeline row, see features.py
+FEATURES = CANDLE_FEATURES
+# Next-step features predicted by the auxiliary models
+AUX_TARGETS = ["open", "high", "low", "volume", "turnover"]
+
+# Longest forecast we serve, the direct strategy trains one output per horizon up to it
+MAX_HORIZON = 30
+
+CLOSE_INDEX = FEATURES.index("close")
+AUX_INDICES = [FEATURES.index(target) for target in AUX_TARGETS]
+
+# MAX_HORIZON-day forecasts keyed by (crypto, model type, strategy, model version, last candle time).
+# A new model version or a new candle changes the key, so stale entries are never served.
+forecast_cache = TTLCache("forecasts", maxsize=FORECAST_CACHE_SIZE)
+
+
+def make_predictor(model):
+    """Return a function that maps a 2-D float64 array to predictions shaped like ``model.predict``.
+
+    For single-row inputs most of ``predict`` is wrapper overhead: sklearn
+    forests validate the input and dispatch every tree through joblib, the
+    LightGBM wrapper re-checks feature names, meta-estimators add their own
+    validation on top. The underlying trees and boosters are called directly.
+    """
+    if type(model).__module__.startswith("sklearn."):
+        predict = _make_sklearn_predictor(model)
+        if predict is not None:
+            return predict
+
+    booster = getattr(model, "booster_", None)
+    if booster is not None and type(booster).__module__.startswith("lightgbm"):
+        return booster.predict
+
+    return model.predict
+
+
+def _make_sklearn_predictor(model):
+    # Only called for sklearn estimators, so artifacts and boosters never import sklearn
+    from sklearn.compose import TransformedTargetRegressor
+    from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        n_outputs = model.n_outputs_
+        scale = 1.0 / len(trees)
+
+        def predict_forest(X):
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            total = trees[0].predict(X).reshape(len(X), n_outputs).astype(np.float64)
+            for tree in trees[1:]:
+                total += tree.predict(X).reshape(len(X), n_outputs)
+            total *= scale
+            return total[:, 0] if n_outputs == 1 else total
+
+        return predict_forest
+
+    if isinstance(model, MultiOutputRegressor):
+        predictors = [make_predictor(estimator) for estimator in model.estimators_]
+        return lambda X: np.column_stack([predict(X) for predict in predictors])
+
+    if isinstance(model, TransformedTargetRegressor) and isinstance(model.transformer_, StandardScaler):
+        predict_inner = make_predictor(model.regressor_)
+        mean = model.transformer_.mean_ if model.transformer_.mean_ is not None else 0.0
+        scale = model.transformer_.scale_ if model.transformer_.scale_ is not None else 1.0
+        return lambda X: predict_inner(X).reshape(len(X), -1) * scale + mean
+
+    return None
+
+
+def recursive_forecast(models, last_features: np.ndarray, n_days: int) -> np.ndarray:
+    """Roll a bundle trained on the bare candle forward ``n_days`` steps and return the predicted closes.
+
+    State lives in two preallocated (1, n_features) float64 buffers that swap
+    roles every step, so no DataFrame is built inside the loop. Bundles with a
+    multi-output ``features`` model need one feature call and one close call
+    per step, older bundles with one model per feature are still supported.
+    """
+    state = np.empty((1, len(FEATURES)), dtype=np.float64)
+    state[0] = last_features
+    next_row = np.empty_like(state)
+    preds = np.empty(n_days, dtype=np.float64)
+    predict_close = make_predictor(models["close"])
+    if "features" in models:
+        predict_features = make_predictor(models["features"])
+    else:
+        aux_models = [(index, make_predictor(models[target])) for index, target in zip(AUX_INDICES, AUX_TARGETS)]
+
+    for step in range(n_days):
+        # Predict features
+        if "features" in models:
+            next_row[0, AUX_INDICES] = predict_features(state)[0]
+        else:
+            for index, predict in aux_models:
+                next_row[0, index] = predict(state)[0]
+        # The close model sees the previous day's close
+        next_row[0, CLOSE_INDEX] = state[0, CLOSE_INDEX]
+
+        preds[step] = predict_close(next_row)[0]
+
+        # The predicted row becomes the state of the next step
+        state, next_row = next_row, state
+        state[0, CLOSE_INDEX] = preds[step]
+
+    return preds
+
+
+def pipeline_forecast(models, state, n_days: int) -> np.ndarray:
+    """Roll a bundle trained on pipeline features forward ``n_days`` steps and return the predicted closes.
+
+    As in training, both the feature and the close model see the feature row
+    of the latest candle. The predicted candle is pushed into ``state``
+    (features.RollingState), which updates lags and rolling windows in O(1).
+    """
+    candle = np.empty(len(FEATURES), dtype=np.float64)
+    preds = np.empty(n_days, dtype=np.float64)
+    predict_features = make_predictor(models["features"])
+    predict_close = make_predictor(models["close"])
+
+    for step in range(n_days):
+        candle[AUX_INDICES] = predict_features(state.row)[0]
+        candle[CLOSE_INDEX] = preds[step] = predict_close(state.row)[0]
+        state.push(candle)
+
+    return preds
+
+
+def direct_forecast(models, last_features: np.ndarray, n_days: int) -> np.ndarray:
+    """Predict closes for horizons 1..n_days with one call to the multi-horizon model."""
+    predict_horizons = make_predictor(models["direct"])
+    return predict_horizons(last_features.reshape(1, -1))[0, :n_days]
+
+
+# Forecasting function
+def forecast_n_days(models, df: pd.DataFrame, model_name: str, n_days: int, strategy: str = "recursive"):
+    try:
+        if model_name == "prophet":
+            model = models["prophet"]
+            # Only the days after the last candle, not the whole history again
+            future = pd.DataFrame({
+                "ds": pd.date_range(start=df["timestamp"].iloc[-1] + pd.Timedelta(days=1), periods=n_days)
+            })
+            forecast = model.predict(future)
+            result = forecast[["ds", "yhat"]].reset_index(drop=True)
+            result.columns = ["timestamp", "predicted_close"]
+            return result
+
+        pipeline = models.get("pipeline")
+        if pipeline is not None:
+            state = pipeline.rolling_state(df)
+            last_features = state.row[0]
+        else:
+            last_features = np.array([df[feature].iat[-1] for feature in FEATURES], dtype=np.float64)
+
+        if strategy == "direct" and "direct" in models:
+            preds = direct_forecast(models, last_features, n_days)
+        else:
+            if strategy == "direct":
+                logger.warning(f"{model_name} bundle has no multi-horizon model, falling back to recursive forecasting")
+            # For other model types, use recursive forecasting
+            if pipeline is not None:
+                preds = pipeline_forecast(models, state, n_days)
+            else:
+                preds = recursive_forecast(models, last_features, n_days)
+
+        future_dates = pd.date_range(start=df["timestamp"].iloc[-1] + pd.Timedelta(days=1), periods=n_days)
+        return pd.DataFrame({"timestamp": future_dates, "predicted_close": preds})
+    except Exception as e:
+        logger.error(f"Error in forecast_n_days: {e}")
+        raise e
+
+
+def cached_forecast(models, df: pd.DataFrame, model_name: str, n_days: int, strategy: str, crypto: str, model_version: Optional[str]):
+    """Serve an ``n_days`` forecast as a prefix of the cached MAX_HORIZON forecast for the same model and candles."""
+    if model_version is None:
+        return forecast_n_days(models, df, model_name, n_days, strategy)
+
+    if model_name == "prophet":
+        strategy = "recursive"
+    key = (crypto, model_name, strategy, model_version, df["timestamp"].iat[-1])
+    forecast = forecast_cache.get_or_load(
+        key, lambda: forecast_n_days(models, df, model_name, MAX_HORIZON, strategy)
+    )
+    return forecast.head(n_days).reset_index(drop=True)
+
+
+def invalidate_forecasts(crypto: str, model_name: str) -> int:
+    """Drop every cached forecast of a crypto/model pair, e.g. when a new model is published."""
+    return forecast_cache.invalidate_where(lambda key: key[0] == crypto and key[1] == model_name)
@@ -1,30 +1,39 @@
 # ml_service/app/main.py
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Any, Optional, Union
-from pydantic import BaseModel, Field
+from typing import Dict, List, Any, Optional, Tuple, Union
+from pydantic import BaseModel, Field, ValidationError
 import os
-import joblib
-import pickle
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 import logging
 import json
 from enum import Enum
 import time
-import matplotlib.pyplot as plt
-import io
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 import base64
+import copy
 
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_error
-import xgboost as xgb
-import lightgbm as lgb
-
-from pybit.unified_trading import HTTP
+# Model libraries (sklearn, xgboost, lightgbm, prophet) and matplotlib are imported
+# where a model of that type is first trained or loaded, or a chart is rendered,
+# keep them out of module level so the service starts fast
 
+from .config import MODELS_DIR, TRAINING_INFO_FILE, MODEL_MAX_AGE_HOURS, MODEL_MEMORY_BUDGET_MB, MODEL_KEEP_VERSIONS, RETRAIN_WORKERS, RETRAIN_BACKOFF_MINUTES, PROPHET_UNCERTAINTY_SAMPLES, BACKTEST_WORKERS, TICKER_REFRESH_SECONDS, PREDICT_BATCH_MAX_ITEMS
+from .executors import run_in, run_io, run_cpu, run_chart
+from .market_data import get_historical_data, sync_many
+from .exchange import bybit
+from .tickers import get_last_price, refresh_tickers
+from .cache import cache_stats
+from .forecasting import cached_forecast, invalidate_forecasts, AUX_TARGETS, MAX_HORIZON
+from .features import CANDLE_FEATURES
+from .training import train_bundles, warm_start_params
+from .backtest import cached_backtest, MIN_TRAIN_DAYS
+from .charts import register_chart, get_chart
+from .artifacts import load_artifact, is_artifact, read_manifest, artifact_size
+from .registry import ModelRegistry, ResidentModel, publish_version, set_current_version, read_pointer, list_versions, version_path
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,10 +42,29 @@ logging.basicConfig(
 logger = logging.getLogger("ml-service")
 
 
+# Keeps the last prices of every supported crypto warm while the app is running
+async def refresh_tickers_forever():
+    symbols = [f"{crypto.value}usdt" for crypto in CryptoType]
+    while True:
+        await run_io(refresh_tickers, symbols)
+        await asyncio.sleep(TICKER_REFRESH_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ticker_task = asyncio.create_task(refresh_tickers_forever())
+    # Stored models are indexed and missing ones trained in the background,
+    # so the port is bound right away. /health/ready reports the progress.
+    startup_task = asyncio.create_task(initialize_models_in_background())
+    yield
+    startup_task.cancel()
+    ticker_task.cancel()
+
+
 app = FastAPI(
     title="Cryptocurrency Price Prediction ML Service",
     description="API for cryptocurrency price predictions using ML models with daily retraining",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -48,18 +76,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Define base paths
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODELS_DIR = os.path.join(BASE_DIR, "models")
-DATA_DIR = os.path.join(BASE_DIR, "data")
-TRAINING_INFO_FILE = os.path.join(MODELS_DIR, "training_info.json")
-
-# Make sure directories exist
-os.makedirs(MODELS_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# Try to load training info
+# Try to load training info. Mutated and saved under training_info_lock, training
+# threads update it while requests read it.
 training_info = {}
+training_info_lock = threading.Lock()
 if os.path.exists(TRAINING_INFO_FILE):
     try:
         with open(TRAINING_INFO_FILE, 'r') as f:
@@ -83,14 +103,44 @@ class ModelType(str, Enum):
     LIGHTGBM = "lightgbm"
     PROPHET = "prophet"
 
+# Enum for forecasting strategies
+class ForecastStrategy(str, Enum):
+    # Roll one-step models forward day by day
+    RECURSIVE = "recursive"
+    # One model output per horizon, all days in a single predict
+    DIRECT = "direct"
+
+# Enum for backtest training windows
+class BacktestWindow(str, Enum):
+    # Every fold trains on all candles before its cutoff
+    EXPANDING = "expanding"
+    # Every fold trains on the last window_size candles before its cutoff
+    ROLLING = "rolling"
+
 # Current model state
 class ModelState:
     current_model_type: ModelType = ModelType.RANDOM_FOREST
-    models = {}
+    # Models in memory, loaded on first use and evicted past the memory budget
+    registry = ModelRegistry(int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024))
+    # Stored models by crypto and model type, resident or not
     model_info = {}
-    retraining_in_progress = False
+    # (crypto, model type) pairs being trained, with a future resolved when their training ends
+    retrains_in_flight: Dict[Tuple[str, str], Future] = {}
+    # time.monotonic() of the last failed training of a pair, cleared once it trains
+    retrain_failures: Dict[Tuple[str, str], float] = {}
+    # Background startup: "pending", "running", then "completed" or "failed"
+    initialization = {"status": "pending", "started_at": None, "finished_at": None, "error": None}
+    lock = threading.Lock()
+
+# Executor for stale-while-revalidate retrains and /retrain runs
+retrain_executor = ThreadPoolExecutor(max_workers=RETRAIN_WORKERS, thread_name_prefix="retrain")
+# Executor for /backtest runs, their folds are fitted in the training pool
+backtest_executor = ThreadPoolExecutor(max_workers=BACKTEST_WORKERS, thread_name_prefix="backtest")
+
+# Model directory of a crypto/model type pair: kept versions plus a pointer to the published one
+MODEL_ARTIFACT_NAME = "{model_type}_{crypto}"
 
-# Map model types to their file names
+# Pickled bundles written before the artifact format, still loaded when no artifact exists
 MODEL_FILE_MAPPING = {
     ModelType.RANDOM_FOREST: "random_forest_{}_model.pkl",
     ModelType.XGBOOST: "xgboost_{}.pkl",
@@ -98,295 +148,315 @@ MODEL_FILE_MAPPING = {
     ModelType.PROPHET: "prophet_{}_model.pkl"
 }
 
-# Data fetching function from Bybit
-def get_historical_data(symbol: str, days: int = 1000):
-# Always convert symbol to uppercase
-    symbol = symbol.upper()
-    if not symbol.endswith("USDT"):
-        symbol = symbol + "USDT"
-    
-    try:
-        session = HTTP(testnet=False)
-        end_time = int(datetime.now().timestamp() * 1000)
-        start_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
-        
-        response = session.get_kline(
-            category="linear",
-            symbol=symbol,
-            interval="D",
-            start=start_time,
-            end=end_time,
-            limit=days
-        )
-        
-        if response["retCode"] != 0:
-            logger.error(f"Error fetching data from Bybit: {response['retMsg']}")
-            raise Exception(f"Bybit API error: {response['retMsg']}")
-            
-        raw = response["result"]["list"]
-        df = pd.DataFrame(raw, columns=["timestamp", "open", "high", "low", "close", "volume", "turnover"])
-        df["timestamp"] = pd.to_datetime(df["timestamp"].astype(int), unit="ms")
-        for col in ["open", "high", "low", "close", "volume", "turnover"]:
-            df[col] = df[col].astype(float)
-            
-        # Add target column for prediction (next day's close price)
-        df["target"] = df["close"].shift(-1)
-        df = df.dropna()
-        df = df.sort_values("timestamp")
-        
-        # Save the data for later use
-        data_file = os.path.join(DATA_DIR, f"{symbol}_data.csv")
-        df.to_csv(data_file, index=False)
-        logger.info(f"Saved {symbol} data to {data_file}")
-        
-        return df
-    except Exception as e:
-        logger.error(f"Error in get_historical_data: {e}")
-        raise e
-
-# Model training function
-def train_model(df: pd.DataFrame, model_name: str, crypto: str):
-    from sklearn.ensemble import RandomForestRegressor
-    from sklearn.metrics import mean_absolute_error
-    import xgboost as xgb
-    import lightgbm as lgb
-    
+# Model training function: fits the given model types for one crypto in the training pool
+def train_models(df: pd.DataFrame, model_names: List[str], crypto: str) -> Dict[str, Any]:
     try:
         crypto = crypto.lower()
         if not crypto.endswith("usdt"):
             crypto = crypto + "usdt"
             
-        # Clean the data
-        df = df.dropna().sort_values("timestamp").reset_index(drop=True)
-        features = ["open", "high", "low", "close", "volume", "turnover"]
+        # Clean the data. The latest candle has no "target" yet but is still history:
+        # Prophet fits it, the supervised targets are shifted feature rows and skip it on their own.
+        df = df.dropna(subset=CANDLE_FEATURES).sort_values("timestamp").reset_index(drop=True)
+        model_names = [ModelType(model_name).value for model_name in model_names]
         
-        if model_name == "prophet":
-            try:
-                from prophet import Prophet
-                # Prophet requires specific format
-                df_p = df[["timestamp", "close"]].rename(columns={"timestamp": "ds", "close": "y"})
-                test_size = int(len(df_p) * 0.2)
-                train_df = df_p[:-test_size]
-                test_df = df_p[-test_size:]
-                
-                model = Prophet()
-                model.fit(train_df)
-                
-                future = model.make_future_dataframe(periods=test_size)
-                forecast = model.predict(future)
-                
-                y_true = test_df["y"].values
-                y_pred = forecast[["ds", "yhat"]].tail(test_size)["yhat"].values
-                
-                mae = mean_absolute_error(y_true, y_pred)
-                logger.info(f"PROPHET MAE on test set: {mae:.2f}")
-                
-                # Save model
-                model_path = os.path.join(MODELS_DIR, MODEL_FILE_MAPPING[ModelType.PROPHET].format(crypto[:3]))
-                with open(model_path, 'wb') as f:
-                    pickle.dump(model, f)
-                
-                # Update training info
-                update_training_info(crypto[:3], "prophet", mae)
-                    
-                return {"prophet": model}
-                
-            except Exception as e:
-                logger.error(f"Error training Prophet model: {e}")
-                # Default to Random Forest if Prophet fails
-                model_name = "random_forest"
-                
-        # Prepare models for other algorithms
-        models = {}
-        model_class = {
-            "random_forest": RandomForestRegressor,
-            "xgboost": xgb.XGBRegressor,
-            "lightgbm": lgb.LGBMRegressor,
-        }
+        # Prophet refits start from the parameters of the previous run
+        prophet_warm_start = get_prophet_warm_start(crypto[:3]) if "prophet" in model_names else None
+        results = train_bundles(df, model_names, prophet_warm_start=prophet_warm_start)
         
-        if model_name not in model_class:
-            raise ValueError(f"Model {model_name} not supported")
-            
-        # Train models for features: open, high, low, volume, turnover
-        for target in ["open", "high", "low", "volume", "turnover"]:
-            X = df[features]
-            y = df[target].shift(-1)
-            X, y = X[:-1], y[:-1]
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-            
-            model = model_class[model_name](n_estimators=100, random_state=42)
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            mae = mean_absolute_error(y_test, y_pred)
-            logger.info(f"{model_name.upper()} → {target} MAE: {mae:.2f}")
+        if "error" in results.get("prophet", {}):
+            logger.error(f"Error training Prophet model: {results['prophet']['error']}")
+            # Default to Random Forest if Prophet fails
+            if "random_forest" not in results:
+                results.update(train_bundles(df, ["random_forest"]))
+        
+        trained = {}
+        for model_name, bundle in results.items():
+            if "error" in bundle:
+                if model_name != "prophet":
+                    logger.error(f"Error training {model_name} model for {crypto}: {bundle['error']}")
+                continue
             
-            models[target] = model
+            models = bundle["models"]
+            mae = bundle["mae"]
+            if model_name == "prophet":
+                accuracy = mae["prophet"]
+                warm_started = bundle.get("warm_started", {})
+                logger.info(
+                    f"PROPHET MAE on test set: {accuracy:.2f} (hold-out fit {'warm' if warm_started.get('holdout') else 'cold'}, "
+                    f"served fit {'warm' if warm_started.get('model') else 'cold'} start)"
+                )
+            else:
+                for i, target in enumerate(AUX_TARGETS):
+                    logger.info(f"{model_name.upper()} → {target} MAE: {mae['features'][i]:.2f}")
+                accuracy = float(mae["close"])
+                logger.info(f"{model_name.upper()} → close MAE: {accuracy:.2f}")
+                horizon_mae = mae["direct"]
+                logger.info(
+                    f"{model_name.upper()} → direct close MAE: h1 {horizon_mae[0]:.2f}, "
+                    f"h7 {horizon_mae[6]:.2f}, h{MAX_HORIZON} {horizon_mae[-1]:.2f}"
+                )
             
-        # Train model for close price (main target)
-        X = df[features]
-        y = df["close"].shift(-1)
-        X, y = X[:-1], y[:-1]
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-        
-        close_model = model_class[model_name](n_estimators=100, random_state=42)
-        close_model.fit(X_train, y_train)
-        y_pred = close_model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        logger.info(f"{model_name.upper()} → close MAE: {mae:.2f}")
-        
-        models["close"] = close_model
-        
-        # Save all models
-        model_path = os.path.join(MODELS_DIR, MODEL_FILE_MAPPING[model_name].format(crypto[:3]))
-        with open(model_path, 'wb') as f:
-            joblib.dump(models, f)
+            # Save all models as a new version and publish it, readers never see a half-written one.
+            # The resident copy is loaded back from it, so forests are memory-mapped
+            # and shared with every other process serving the same version.
+            metadata = {"model_type": model_name, "crypto": crypto[:3], "accuracy": accuracy}
+            if "warm_start" in bundle:
+                metadata["warm_start"] = bundle["warm_start"]
+            version, model_path = publish_version(
+                get_model_path(crypto[:3], model_name),
+                models,
+                metadata,
+                keep=MODEL_KEEP_VERSIONS
+            )
+            models = read_model_file(model_name, model_path)
+            publish_model(crypto[:3], model_name, models, model_path, version)
             
-        # Update training info
-        update_training_info(crypto[:3], model_name, mae)
+            # Update training info
+            update_training_info(crypto[:3], model_name, accuracy, bundle["timings"], bundle["wall_clock_seconds"])
+            trained[model_name] = models
         
-        return models
+        return trained
     except Exception as e:
-        logger.error(f"Error in train_model: {e}")
+        logger.error(f"Error in train_models: {e}")
         raise e
 
+# Warm start parameters of the published Prophet model of a crypto and of the
+# hold-out fit that measured it, None if nothing was published
+def get_prophet_warm_start(crypto: str) -> Optional[Dict[str, Any]]:
+    try:
+        resident = get_resident_model(crypto, ModelType.PROPHET)
+        if resident is None or "prophet" not in resident.model:
+            return None
+        warm_start = {"model": warm_start_params(resident.model["prophet"])}
+        found = find_model(crypto, ModelType.PROPHET)
+        if found is not None and is_artifact(found[0]):
+            warm_start.update(read_manifest(found[0]).get("warm_start", {}))
+        return warm_start
+    except Exception as e:
+        logger.warning(f"No Prophet warm start for {crypto}: {e}")
+        return None
+
+# Bundle of a model type among the results of train_models, Random Forest stands in for a failed Prophet
+def trained_bundle(trained: Dict[str, Any], model_name: str, crypto: str):
+    if model_name in trained:
+        return trained[model_name]
+    if model_name == "prophet" and "random_forest" in trained:
+        return trained["random_forest"]
+    raise RuntimeError(f"Training {model_name} model for {crypto} failed")
+
 # Function to update training info
-def update_training_info(crypto: str, model_name: str, accuracy: float):
+def update_training_info(crypto: str, model_name: str, accuracy: float, fit_seconds: Optional[Dict[str, float]] = None, wall_clock_seconds: Optional[float] = None):
     global training_info
     
     crypto = crypto.lower()
     current_time = datetime.now().isoformat()
     
-    if crypto not in training_info:
-        training_info[crypto] = {}
-        
-    training_info[crypto][model_name] = {
-        "last_trained": current_time,
-        "accuracy": accuracy
-    }
-    
-    # Save to file
-    try:
-        with open(TRAINING_INFO_FILE, 'w') as f:
-            json.dump(training_info, f, indent=2)
-        logger.info(f"Updated training info for {crypto} {model_name}")
-    except Exception as e:
-        logger.error(f"Error saving training info: {e}")
-
-# Forecasting function
-def forecast_n_days(models, df: pd.DataFrame, model_name: str, n_days: int):
-    try:
-        if model_name == "prophet":
-            model = models["prophet"]
-            future = model.make_future_dataframe(periods=n_days)
-            forecast = model.predict(future)
-            result = forecast[["ds", "yhat"]].tail(n_days)
-            result.columns = ["timestamp", "predicted_close"]
-            return result
-            
-        # For other model types, use recursive forecasting
-        preds = []
-        last_row = df.iloc[-1:].copy()
+    with training_info_lock:
+        training_info.setdefault(crypto, {})[model_name] = {
+            "last_trained": current_time,
+            "accuracy": accuracy,
+            # Seconds spent on each fit and on the whole training run it was part of
+            "fit_seconds": fit_seconds or {},
+            "wall_clock_seconds": wall_clock_seconds
+        }
+        snapshot = copy.deepcopy(training_info)
         
-        for _ in range(n_days):
-            # Predict features
-            next_features = {}
-            for feat in ["open", "high", "low", "volume", "turnover"]:
-                X_feat = last_row[["open", "high", "low", "close", "volume", "turnover"]].values
-                y_feat = models[feat].predict(X_feat)[0]
-                next_features[feat] = y_feat
-                
-            # Create row with features
-            feature_row = {
-                "open": next_features["open"],
-                "high": next_features["high"],
-                "low": next_features["low"],
-                "close": last_row["close"].values[0],  # previous day's close
-                "volume": next_features["volume"],
-                "turnover": next_features["turnover"],
-            }
-            
-            X_close = pd.DataFrame([feature_row])[["open", "high", "low", "close", "volume", "turnover"]]
-            y_close = models["close"].predict(X_close)[0]
-            preds.append(y_close)
-            
-            # Create new row for next iteration
-            new_row = pd.DataFrame([{
-                "timestamp": last_row["timestamp"].values[0] + pd.Timedelta(days=1),
-                "open": next_features["open"],
-                "high": next_features["high"],
-                "low": next_features["low"],
-                "close": y_close,
-                "volume": next_features["volume"],
-                "turnover": next_features["turnover"],
-            }])
-            
-            last_row = new_row
-            
-        future_dates = pd.date_range(start=df["timestamp"].iloc[-1] + pd.Timedelta(days=1), periods=n_days)
-        return pd.DataFrame({"timestamp": future_dates, "predicted_close": preds})
-    except Exception as e:
-        logger.error(f"Error in forecast_n_days: {e}")
-        raise e
+        # Save to file, written aside and renamed so readers never see a partial file.
+        # Still under the lock, so an older snapshot never replaces a newer file.
+        try:
+            tmp_path = f"{TRAINING_INFO_FILE}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_path, TRAINING_INFO_FILE)
+            logger.info(f"Updated training info for {crypto} {model_name}")
+        except Exception as e:
+            logger.error(f"Error saving training info: {e}")
 
 # Main prediction function
-def predict_token_price(symbol: str, model_name: str, n_days: int):
+def predict_token_price(symbol: str, model_name: str, n_days: int, strategy: str = "recursive", df: Optional[pd.DataFrame] = None):
+    if not 1 <= n_days <= 30:
+        raise ValueError("Forecast days must be between 1 and 30")
+    
+    forecasts, df = predict_token_prices(symbol, model_name, [(n_days, strategy)], df)
+    # Return the loaded history too, so callers don't have to fetch it again
+    return forecasts[0], df
+
+# Forecasts of one crypto/model pair for several (n_days, strategy) requests.
+# The model and the history are resolved once, and every request is a prefix
+# of a single MAX_HORIZON forecast per strategy.
+def predict_token_prices(symbol: str, model_name: str, horizons: List[Tuple[int, str]], df: Optional[pd.DataFrame] = None):
     try:
         if model_name not in [m.value for m in ModelType]:
             raise ValueError(f"Unsupported model type: {model_name}")
             
-        if not 1 <= n_days <= 30:
-            raise ValueError("Forecast days must be between 1 and 30")
-            
-        # Get historical data
-        logger.info(f"Getting historical data for {symbol}...")
-        df = get_historical_data(symbol, days=1000)
+        # Get historical data, unless the caller already loaded it
+        if df is None:
+            logger.info(f"Getting historical data for {symbol}...")
+            df = get_historical_data(symbol, days=1000)
         
-        # Check if we need to train a new model
-        should_train = False
+        # Check if the model is stale
+        is_stale = False
         symbol_key = symbol[:3].lower()
         
         if symbol_key not in training_info:
-            logger.info(f"No training info for {symbol_key}, training new model")
-            should_train = True
+            logger.info(f"No training info for {symbol_key}")
+            is_stale = True
         elif model_name not in training_info[symbol_key]:
-            logger.info(f"No training info for {symbol_key} {model_name}, training new model")
-            should_train = True
+            logger.info(f"No training info for {symbol_key} {model_name}")
+            is_stale = True
         else:
-            # Check if model was trained in the last 24 hours
+            # Check if model was trained within MODEL_MAX_AGE_HOURS
             last_trained = datetime.fromisoformat(training_info[symbol_key][model_name]["last_trained"])
             time_diff = datetime.now() - last_trained
-            if time_diff.days >= 1:
-                logger.info(f"Model for {symbol_key} {model_name} is older than 24 hours, retraining")
-                should_train = True
+            if time_diff >= timedelta(hours=MODEL_MAX_AGE_HOURS):
+                logger.info(f"Model for {symbol_key} {model_name} is older than {MODEL_MAX_AGE_HOURS:g} hours")
+                is_stale = True
                 
-        # Train model if needed
-        if should_train:
-            logger.info(f"Training {model_name} model for {symbol}...")
-            models = train_model(df, model_name, symbol)
+        # Use the resident model, it is read from disk on first use or when a new version was published
+        model_type = ModelType(model_name)
+        resident = get_resident_model(symbol_key, model_name)
+        if resident is None:
+            # Nothing to serve yet, this request has to wait for training
+            models, model_version = train_model_once(df, model_name, symbol_key)
         else:
-            # Load existing model
-            model_path = os.path.join(MODELS_DIR, MODEL_FILE_MAPPING[model_name].format(symbol_key))
-            if not os.path.exists(model_path):
-                logger.info(f"Model file {model_path} not found, training new model")
-                models = train_model(df, model_name, symbol)
-            else:
-                logger.info(f"Loading existing model from {model_path}")
-                if model_name == "prophet":
-                    with open(model_path, 'rb') as f:
-                        models = {"prophet": pickle.load(f)}
-                else:
-                    models = joblib.load(model_path)
+            # Serve the stale model while a fresh one trains in the background
+            if is_stale:
+                schedule_retrain(symbol_key, model_name)
+            models = resident.model
+            model_version = resident.version
                     
-        # Make forecast
-        logger.info(f"Forecasting {n_days} days ahead...")
-        forecast = forecast_n_days(models, df, model_name, n_days)
+        # Make forecasts, every horizon is served from the cached longest forecast
+        full_forecasts = {}
+        forecasts = []
+        for n_days, strategy in horizons:
+            if strategy not in full_forecasts:
+                logger.info(f"Forecasting {MAX_HORIZON} days ahead with {model_name} ({strategy})...")
+                full_forecasts[strategy] = cached_forecast(models, df, model_type.value, MAX_HORIZON, strategy, symbol_key, model_version)
+            forecasts.append(full_forecasts[strategy].head(n_days).reset_index(drop=True))
         
-        return forecast
+        return forecasts, df
     except Exception as e:
-        logger.error(f"Error in predict_token_price: {e}")
+        logger.error(f"Error in predict_token_prices: {e}")
         raise e
 
-# Model loader
+# Registry key of a crypto/model type pair, the same as its artifact directory name
+def get_model_key(crypto: str, model_type: str) -> str:
+    return MODEL_ARTIFACT_NAME.format(model_type=ModelType(model_type).value, crypto=crypto)
+
+# Model directory of a crypto/model type pair
+def get_model_path(crypto: str, model_type: str) -> str:
+    return os.path.join(MODELS_DIR, get_model_key(crypto, model_type))
+
+# Path of the pickled bundle older versions of the service wrote
+def get_legacy_model_path(crypto: str, model_type: str) -> str:
+    return os.path.join(MODELS_DIR, MODEL_FILE_MAPPING[ModelType(model_type)].format(crypto))
+
+# Path and version of the model to serve for a crypto/model type pair, None if nothing is stored.
+# The published version wins over an artifact saved before versioning, which wins over a legacy file.
+def find_model(crypto: str, model_type: str) -> Optional[Tuple[str, str]]:
+    model_dir = get_model_path(crypto, model_type)
+    pointer = read_pointer(model_dir)
+    if pointer is not None:
+        return version_path(model_dir, pointer["version"]), pointer["version"]
+    for path in (model_dir, get_legacy_model_path(crypto, model_type)):
+        version = get_model_version(path)
+        if version is not None:
+            return path, version
+    return None
+
+# Version of an unversioned artifact or legacy file, it changes every time the file is rewritten
+def get_model_version(path: str) -> Optional[str]:
+    try:
+        model_stats = os.stat(os.path.join(path, "manifest.json") if os.path.isdir(path) else path)
+    except FileNotFoundError:
+        return None
+    return f"{model_stats.st_mtime_ns}-{model_stats.st_size}"
+
+# Bundle of estimators stored at path, Prophet included as {"prophet": model}
+def read_model_file(model_type: str, path: str):
+    if is_artifact(path):
+        models = load_artifact(path)
+    elif model_type == ModelType.PROPHET:
+        import pickle
+        
+        with open(path, 'rb') as f:
+            models = {"prophet": pickle.load(f)}
+    else:
+        import joblib
+        
+        models = joblib.load(path)
+    # Prophet models stored with another setting sample as configured too. Set before the
+    # model is shared, forecasts only read it.
+    if isinstance(models, dict) and "prophet" in models:
+        models["prophet"].uncertainty_samples = PROPHET_UNCERTAINTY_SAMPLES
+    return models
+
+# Bytes a stored model takes on disk, used as the estimate of its size in memory.
+# Artifacts are close to it, memory-mapped forests are exactly their arrays.
+def get_model_size(path: str) -> int:
+    return artifact_size(path) if os.path.isdir(path) else os.path.getsize(path)
+
+# Record a stored model version in ModelState.model_info, returns its size in bytes
+def record_model_info(crypto: str, model_type: ModelType, path: str, version: str) -> int:
+    size = get_model_size(path)
+    with ModelState.lock:
+        ModelState.model_info.setdefault(crypto, {})[model_type] = {
+            "file": path,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "last_modified": datetime.fromtimestamp(os.stat(path).st_mtime).isoformat(),
+            "version": version,
+        }
+    return size
+
+# Make a freshly trained or rolled back model resident under its version. Requests already
+# holding the previous version finish with it, the next ones get the new one.
+def publish_model(crypto: str, model_type: str, model, path: str, version: str):
+    model_type = ModelType(model_type)
+    size = record_model_info(crypto, model_type, path, version)
+    # Forecasts of the previous version must not be served any more
+    invalidate_forecasts(crypto, model_type.value)
+    ModelState.registry.put(get_model_key(crypto, model_type), model, version, size)
+
+# Resident model for a crypto/model type, read from disk on first use, after it was
+# evicted or when a newer version was published. None if no model is stored.
+def get_resident_model(crypto: str, model_type: str) -> Optional[ResidentModel]:
+    model_type = ModelType(model_type)
+    found = find_model(crypto, model_type)
+    if found is None:
+        return None
+    path, version = found
+    
+    def load():
+        logger.info(f"Loading model {model_type.value} for {crypto} version {version} from {path}")
+        size = record_model_info(crypto, model_type, path, version)
+        invalidate_forecasts(crypto, model_type.value)
+        return read_model_file(model_type, path), size
+    
+    return ModelState.registry.get(get_model_key(crypto, model_type), version, load)
+
+# Serve an older kept version of a crypto/model type pair again, the version published
+# before the current one by default. Returns the version now served.
+def rollback_model(crypto: str, model_type: str, version: Optional[str] = None) -> str:
+    model_type = ModelType(model_type)
+    model_dir = get_model_path(crypto, model_type)
+    pointer = read_pointer(model_dir)
+    if pointer is None:
+        raise ValueError(f"No published versions of {model_type.value} for {crypto}")
+    
+    if version is None:
+        history = pointer["history"]
+        position = history.index(pointer["version"]) if pointer["version"] in history else 0
+        if position + 1 >= len(history):
+            raise ValueError(f"No version of {model_type.value} for {crypto} older than {pointer['version']} is kept")
+        version = history[position + 1]
+    
+    path = set_current_version(model_dir, version)
+    publish_model(crypto, model_type, read_model_file(model_type, path), path, version)
+    logger.info(f"Rolled back {model_type.value} for {crypto} to version {version}")
+    return version
+
+# Model index: records every stored model, they are only loaded when first used
 def load_models():
     loaded_count = 0
     
@@ -398,80 +468,144 @@ def load_models():
     for model_type in ModelType:
         for crypto in ["btc", "eth"]:  # Add more cryptos as needed
             try:
-                # Use direct filename mapping from the dictionary
-                model_filename = MODEL_FILE_MAPPING.get(model_type).format(crypto)
-                full_path = os.path.join(MODELS_DIR, model_filename)
-                logger.info(f"Attempting to load model {model_type} for {crypto} from {full_path}")
+                found = find_model(crypto, model_type)
                 
-                if not os.path.exists(full_path):
-                    logger.warning(f"Model file not found: {full_path}")
+                if found is None:
+                    logger.warning(f"Model not found: {get_model_path(crypto, model_type)}")
                     continue
-                    
-                # Load model
-                if model_type == ModelType.PROPHET:
-                    with open(full_path, 'rb') as f:
-                        model = pickle.load(f)
-                else:
-                    model = joblib.load(full_path)
-                
-                # Save model in state
-                if crypto not in ModelState.models:
-                    ModelState.models[crypto] = {}
-                    
-                ModelState.models[crypto][model_type] = model
                 
-                # Save model metadata
-                if crypto not in ModelState.model_info:
-                    ModelState.model_info[crypto] = {}
-                    
-                model_stats = os.stat(full_path)
-                ModelState.model_info[crypto][model_type] = {
-                    "file": full_path,
-                    "size_mb": round(model_stats.st_size / (1024 * 1024), 2),
-                    "last_modified": datetime.fromtimestamp(model_stats.st_mtime).isoformat(),
-                }
+                full_path, version = found
+                record_model_info(crypto, model_type, full_path, version)
                 
                 loaded_count += 1
-                logger.info(f"Successfully loaded model {model_type} for {crypto} from {full_path}")
+                logger.info(f"Model {model_type.value} for {crypto} found at {full_path}")
                 
             except Exception as e:
                 logger.error(f"Error loading model {model_type} for {crypto}: {str(e)}")
     
-    logger.info(f"Loaded {loaded_count} models successfully")
+    logger.info(f"Found {loaded_count} stored models, they are loaded on first use")
     return loaded_count
 
+# Reserve crypto/model pairs for a training run. Returns the futures of the pairs
+# it reserved and of the pairs another run is already training, which it skips.
+# With `backoff` it also skips pairs that failed less than RETRAIN_BACKOFF_MINUTES ago.
+# Reserved pairs show as "training" in /health/ready until release_retrains.
+def reserve_retrains(crypto: str, model_names: List[str], backoff: bool = False) -> Tuple[Dict[Tuple[str, str], Future], Dict[Tuple[str, str], Future]]:
+    reserved, in_flight = {}, {}
+    now = time.monotonic()
+    with ModelState.lock:
+        for model_name in model_names:
+            key = (crypto, ModelType(model_name).value)
+            failed_at = ModelState.retrain_failures.get(key)
+            if key in ModelState.retrains_in_flight:
+                in_flight[key] = ModelState.retrains_in_flight[key]
+            elif not (backoff and failed_at is not None and now - failed_at < RETRAIN_BACKOFF_MINUTES * 60):
+                reserved[key] = ModelState.retrains_in_flight[key] = Future()
+    return reserved, in_flight
+
+# End the training run of reserved pairs, waiters of the pairs missing from `trained` get an error
+# and the pairs are backed off
+def release_retrains(reserved: Dict[Tuple[str, str], Future], trained: Dict[str, Any]):
+    now = time.monotonic()
+    with ModelState.lock:
+        for key in reserved:
+            del ModelState.retrains_in_flight[key]
+            if key[1] in trained:
+                ModelState.retrain_failures.pop(key, None)
+            else:
+                ModelState.retrain_failures[key] = now
+    for (crypto, model_name), future in reserved.items():
+        if model_name in trained:
+            future.set_result(None)
+        else:
+            future.set_exception(RuntimeError(f"Training {model_name} model for {crypto} failed"))
+
+# Train a model nothing can be served from yet. Concurrent callers share one training
+# run: the first one trains, the others wait for it and serve the model it published.
+# Returns the models and their version.
+def train_model_once(df: pd.DataFrame, model_name: str, crypto: str) -> Tuple[Any, Optional[str]]:
+    model_name = ModelType(model_name).value
+    reserved, in_flight = reserve_retrains(crypto, [model_name], backoff=True)
+    if not reserved and not in_flight:
+        raise RuntimeError(
+            f"Training {model_name} model for {crypto} failed less than {RETRAIN_BACKOFF_MINUTES:g} minutes ago, not retrying yet"
+        )
+    if in_flight:
+        logger.info(f"No model for {crypto} {model_name}, waiting for the training in flight")
+        next(iter(in_flight.values())).result()
+        resident = get_resident_model(crypto, model_name)
+        if resident is None:
+            raise RuntimeError(f"Training {model_name} model for {crypto} failed")
+        return resident.model, resident.version
+    
+    logger.info(f"No model for {crypto} {model_name}, training new model")
+    trained = {}
+    try:
+        trained = train_models(df, [model_name], crypto)
+    finally:
+        release_retrains(reserved, trained)
+    models = trained_bundle(trained, model_name, crypto)
+    return models, ModelState.model_info.get(crypto, {}).get(ModelType(model_name), {}).get("version")
+
+# Background retrain of one crypto/model pair, at most one per pair in flight and
+# none within RETRAIN_BACKOFF_MINUTES of a failed one, the stale model keeps serving.
+# The new model replaces the resident one only once it is trained and saved.
+def schedule_retrain(crypto: str, model_name: str) -> bool:
+    reserved, _ = reserve_retrains(crypto, [model_name], backoff=True)
+    if not reserved:
+        return False
+    model_name = ModelType(model_name).value
+    
+    def run():
+        trained = {}
+        try:
+            logger.info(f"Background retrain of {model_name} for {crypto} started")
+            df = get_historical_data(f"{crypto}usdt", days=1000)
+            trained = train_models(df, [model_name], crypto)
+            trained_bundle(trained, model_name, crypto)
+            logger.info(f"Background retrain of {model_name} for {crypto} finished")
+        except Exception as e:
+            logger.error(f"Background retrain of {model_name} for {crypto} failed: {e}")
+        finally:
+            release_retrains(reserved, trained)
+    
+    retrain_executor.submit(run)
+    return True
+
 # Функция для обучения всех типов моделей для одной криптовалюты
 def train_all_models_for_crypto(crypto: str):
+    # Shown as "training" by /health/ready, and keeps stale-model retrains of the same pairs away
+    reserved, _ = reserve_retrains(crypto, list(ModelType))
+    trained = {}
     try:
         logger.info(f"Starting training all models for {crypto}...")
         # Получение исторических данных для заданной криптовалюты
         symbol = f"{crypto}usdt"
         df = get_historical_data(symbol, days=200)
         
-        # Обучение всех типов моделей
-        for model_type in ModelType:
-            logger.info(f"Training {model_type} model for {crypto}...")
-            try:
-                train_model(df, model_type, crypto)
-                logger.info(f"Successfully trained {model_type} model for {crypto}")
-            except Exception as e:
-                logger.error(f"Error training {model_type} model for {crypto}: {e}")
+        # Обучение всех типов моделей параллельно в пуле процессов
+        trained = train_models(df, list(ModelType), crypto)
+        logger.info(f"Successfully trained {', '.join(trained)} models for {crypto}")
         
         logger.info(f"Completed training all models for {crypto}")
         return True
     except Exception as e:
         logger.error(f"Error in train_all_models_for_crypto: {e}")
         return False
+    finally:
+        release_retrains(reserved, trained)
 
 # Функция инициализации моделей - проверяет наличие моделей и обучает их при необходимости
 def initialize_models():
     # Сначала загрузим существующие модели
     loaded_count = load_models()
-    logger.info(f"Loaded {loaded_count} models from disk")
+    logger.info(f"Found {loaded_count} models on disk")
     
     # Проверим, есть ли хотя бы одна модель для каждой криптовалюты
     cryptos = [crypto.value for crypto in CryptoType]
-    models_needed = False
+    
+    # Загружаем историю всех криптовалют параллельно, дальше она читается из хранилища
+    sync_many(cryptos, days=1000)
     
     # Проверяем, существуют ли модели для каждой криптовалюты и типа модели
     for crypto in cryptos:
@@ -479,37 +613,57 @@ def initialize_models():
         
         # Проверяем каждый тип модели
         for model_type in ModelType:
-            model_filename = MODEL_FILE_MAPPING.get(model_type).format(crypto)
-            full_path = os.path.join(MODELS_DIR, model_filename)
-            
-            if os.path.exists(full_path):
+            if find_model(crypto, model_type) is not None:
                 crypto_models_exist = True
                 break
         
         # Если нет моделей для этой криптовалюты, обучаем их
         if not crypto_models_exist:
             logger.info(f"No models found for {crypto}, will train new models")
-            models_needed = True
+            # Обученные модели сразу публикуются, повторная загрузка не нужна
             train_all_models_for_crypto(crypto)
     
-    # Если были обучены новые модели, загружаем их
-    if models_needed:
-        logger.info("New models were trained, reloading models...")
-        load_models()
-    
     return True
 
-# Try to load models on startup
-# load_models()
-# Используем новую функцию для инициализации моделей
-initialize_models()
-load_models()
+# Runs initialize_models off the event loop while the app already serves requests
+async def initialize_models_in_background():
+    ModelState.initialization.update(status="running", started_at=datetime.now().isoformat())
+    try:
+        await run_in(retrain_executor, initialize_models)
+        ModelState.initialization.update(status="completed", finished_at=datetime.now().isoformat())
+        logger.info("Model initialization completed")
+    except Exception as e:
+        logger.error(f"Model initialization failed: {e}")
+        ModelState.initialization.update(status="failed", finished_at=datetime.now().isoformat(), error=str(e))
+
+# Readiness of every crypto/model type pair: "ready" once a model is stored and can be
+# served, "training" while it is being trained in the background, "pending" until
+# initialization has looked for it and "missing" afterwards
+def model_readiness() -> Dict[str, Dict[str, str]]:
+    with ModelState.lock:
+        training = set(ModelState.retrains_in_flight)
+        stored = {crypto: set(models) for crypto, models in ModelState.model_info.items()}
+    initialized = ModelState.initialization["status"] in ("completed", "failed")
+    
+    readiness = {}
+    for crypto in CryptoType:
+        for model_type in ModelType:
+            if model_type in stored.get(crypto.value, ()):
+                state = "ready"
+            elif (crypto.value, model_type.value) in training:
+                state = "training"
+            else:
+                state = "missing" if initialized else "pending"
+            readiness.setdefault(crypto.value, {})[model_type.value] = state
+    return readiness
 
 # Prediction request model - updated to include crypto and days parameters
 class PredictionRequest(BaseModel):
     crypto: CryptoType = Field(CryptoType.BTC, description="Cryptocurrency to predict")
     days: int = Field(1, description="Number of days to predict", ge=1, le=30)
     model_type: Optional[ModelType] = Field(ModelState.current_model_type, description="Model type to use for prediction")
+    strategy: ForecastStrategy = Field(ForecastStrategy.RECURSIVE, description="Forecasting strategy: recursive or direct multi-horizon (ignored by Prophet)")
+    inline_chart: bool = Field(False, description="Embed the chart as base64 PNG instead of only returning its URL")
 
 # Daily prediction model for the response
 class DailyPrediction(BaseModel):
@@ -522,46 +676,117 @@ class PredictionResponse(BaseModel):
     predictions: List[DailyPrediction] = Field(..., description="List of daily predictions")
     model_type: str = Field(..., description="Model type used for the prediction")
     timestamp: str = Field(..., description="Timestamp of the prediction")
-    chart: Optional[str] = Field(None, description="Base64 encoded chart image")
+    chart_id: Optional[str] = Field(None, description="Id of the forecast chart")
+    chart_url: Optional[str] = Field(None, description="Path of the PNG chart, served by /chart/{chart_id}")
+    chart: Optional[str] = Field(None, description="Base64 encoded chart image, only set when inline_chart was requested")
+
+# Batch prediction request model. Items are validated one by one in the endpoint,
+# so an invalid item fails alone instead of the whole batch.
+class BatchPredictionRequest(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., description="Predictions to make, each in the /predict request format", min_length=1, max_length=PREDICT_BATCH_MAX_ITEMS)
+    charts: bool = Field(True, description="Register charts for the results, set to false to skip charts for the whole batch")
+
+# Result of one batch item, either a prediction or the error it failed with
+class BatchPredictionItem(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    result: Optional[PredictionResponse] = Field(None, description="Prediction, if the item succeeded")
+    error: Optional[str] = Field(None, description="Error message, if the item failed")
+
+# Batch prediction response model
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchPredictionItem] = Field(..., description="One entry per requested item, in request order")
+    succeeded: int = Field(..., description="Number of items that succeeded")
+    failed: int = Field(..., description="Number of items that failed")
+    timestamp: str = Field(..., description="Timestamp of the batch")
 
 # Model info response model
 class ModelInfoResponse(BaseModel):
     available_models: Dict[str, List[str]] = Field(..., description="Available models by cryptocurrency")
-    model_details: Dict[str, Dict[str, Any]] = Field(..., description="Details of loaded models")
+    model_details: Dict[str, Dict[str, Any]] = Field(..., description="Details of stored models")
     training_info: Dict[str, Dict[str, Any]] = Field(..., description="Training information for models")
+    registry: Dict[str, Any] = Field(..., description="Models resident in memory, memory budget, loads and evictions")
 
 # Health check response model
 class HealthResponse(BaseModel):
     status: str = Field(..., description="Service status")
     timestamp: str = Field(..., description="Current timestamp")
-    models_loaded: int = Field(..., description="Number of loaded models")
+    models_loaded: int = Field(..., description="Number of models resident in memory")
 
-# Generate chart function
-def generate_prediction_chart(historical_data, forecast_data, symbol):
-    plt.figure(figsize=(12, 5))
-    
-    # Plot historical data
-    plt.plot(historical_data["timestamp"], historical_data["close"], label="Historical Price")
-    
-    # Plot forecast data
-    plt.plot(forecast_data["timestamp"], forecast_data["predicted_close"], label="Forecast", color="red")
-    
-    plt.xlabel("Date")
-    plt.ylabel(f"Price {symbol.upper()}/USDT")
-    plt.title(f"Price Forecast for {symbol.upper()}/USDT")
-    plt.legend()
-    plt.grid(True)
-    
-    # Save plot to bytes buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    
-    # Convert to base64
-    img_str = base64.b64encode(buf.read()).decode("utf-8")
-    plt.close()
-    
-    return img_str
+# Model versions response model
+class ModelVersionsResponse(BaseModel):
+    crypto: str = Field(..., description="Cryptocurrency of the model")
+    model_type: str = Field(..., description="Model type")
+    current: Optional[str] = Field(None, description="Version being served")
+    versions: List[Dict[str, Any]] = Field(..., description="Kept versions, newest first")
+
+# Liveness response model
+class LivenessResponse(BaseModel):
+    status: str = Field(..., description="Service status")
+    timestamp: str = Field(..., description="Current timestamp")
+
+# Readiness response model
+class ReadinessResponse(BaseModel):
+    ready: bool = Field(..., description="Initialization finished and every crypto has a model to serve")
+    timestamp: str = Field(..., description="Current timestamp")
+    initialization: Dict[str, Any] = Field(..., description="Status of the background model initialization")
+    models: Dict[str, Dict[str, str]] = Field(..., description="Readiness by crypto and model type: ready, training, pending or missing")
+
+# Metrics response model
+class MetricsResponse(BaseModel):
+    timestamp: str = Field(..., description="Current timestamp")
+    caches: Dict[str, Dict[str, Any]] = Field(..., description="Hit/miss/eviction counters of in-process caches")
+    exchange: Dict[str, Any] = Field(..., description="Bybit client request, retry and circuit breaker counters")
+
+# Backtest request model
+class BacktestRequest(BaseModel):
+    crypto: CryptoType = Field(CryptoType.BTC, description="Cryptocurrency to backtest")
+    model_type: ModelType = Field(ModelState.current_model_type, description="Model type to backtest")
+    horizon: int = Field(MAX_HORIZON, description="Days forecast from every origin", ge=1, le=MAX_HORIZON)
+    strategy: ForecastStrategy = Field(ForecastStrategy.RECURSIVE, description="Forecasting strategy (ignored by Prophet)")
+    window: BacktestWindow = Field(BacktestWindow.EXPANDING, description="Training window of the folds: expanding or rolling")
+    window_size: Optional[int] = Field(None, description="Training candles of a rolling window, min_train by default", ge=MIN_TRAIN_DAYS)
+    min_train: int = Field(365, description="Training candles of the first fold", ge=MIN_TRAIN_DAYS)
+    step: int = Field(30, description="Candles between fold cutoffs", ge=1)
+    days: int = Field(1000, description="Candles of history to backtest over", ge=MIN_TRAIN_DAYS, le=5000)
+
+# Error of all forecasts at one horizon
+class HorizonError(BaseModel):
+    horizon: int = Field(..., description="Days ahead of the origin")
+    mae: Optional[float] = Field(None, description="Mean absolute error")
+    rmse: Optional[float] = Field(None, description="Root mean squared error")
+    mape: Optional[float] = Field(None, description="Mean absolute percentage error, %")
+    naive_mae: Optional[float] = Field(None, description="MAE of repeating the origin's close")
+    count: int = Field(..., description="Forecasts scored")
+
+# One walk-forward fold
+class BacktestFold(BaseModel):
+    fold: int = Field(..., description="Position of the fold")
+    train_start: str = Field(..., description="First training candle")
+    train_end: str = Field(..., description="Last training candle, the first origin")
+    origins: int = Field(..., description="Candles forecast from")
+    mae: Optional[float] = Field(None, description="MAE over all horizons of the fold")
+    seconds: float = Field(..., description="Fit and predict time of the fold")
+
+# Backtest response model
+class BacktestResponse(BaseModel):
+    crypto: str = Field(..., description="Cryptocurrency that was backtested")
+    model_type: str = Field(..., description="Model type")
+    strategy: str = Field(..., description="Forecasting strategy")
+    window: str = Field(..., description="Training window of the folds")
+    window_size: Optional[int] = Field(None, description="Training candles of a rolling window")
+    min_train: int = Field(..., description="Training candles of the first fold")
+    step: int = Field(..., description="Candles between fold cutoffs")
+    horizon: int = Field(..., description="Days forecast from every origin")
+    candles: int = Field(..., description="Candles of history backtested over")
+    start: str = Field(..., description="First candle")
+    end: str = Field(..., description="Last candle")
+    mae: Optional[float] = Field(None, description="MAE over all forecasts")
+    naive_mae: Optional[float] = Field(None, description="MAE of repeating the origin's close over all forecasts")
+    horizons: List[HorizonError] = Field(..., description="Error curve, one entry per horizon")
+    folds: List[BacktestFold] = Field(..., description="Walk-forward folds")
+    seconds: float = Field(..., description="Wall clock time of the backtest")
+    workers: int = Field(..., description="Training pool processes the folds ran in, 0 when inline")
+    timestamp: str = Field(..., description="Timestamp of the response")
 
 # Updated prediction endpoint
 @app.post("/predict", response_model=PredictionResponse)
@@ -572,76 +797,170 @@ async def predict(request: PredictionRequest):
         days = request.days
         
         # Get crypto symbol
-        symbol = f"{crypto}usdt"
+        symbol = f"{crypto.value}usdt"
         
-        # Make prediction
-        forecast = predict_token_price(symbol, model_type, days)
-        
-        # Get historical data for chart
-        historical_data = get_historical_data(symbol, days=30)
-        
-        # Generate chart
-        chart_img = generate_prediction_chart(historical_data, forecast, crypto)
+        # Blocking stages run in executors so other requests keep being served
+        df = await run_io(get_historical_data, symbol, days=1000)
         
-        # Format predictions
-        daily_predictions = []
-        for _, row in forecast.iterrows():
-            daily_predictions.append(
-                DailyPrediction(
-                    date=row["timestamp"].strftime("%Y-%m-%d"),
-                    price=round(float(row["predicted_close"]), 2)
-                )
-            )
+        # Make prediction
+        forecast, df = await run_cpu(predict_token_price, symbol, model_type, days, request.strategy.value, df)
         
-        # Return prediction response
-        return PredictionResponse(
-            crypto=crypto,
-            predictions=daily_predictions,
-            model_type=model_type,
-            timestamp=datetime.now().isoformat(),
-            chart=chart_img
-        )
+        return await build_prediction_response(request, forecast, df)
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
-# Model retraining function
-async def retrain_models_task(crypto: CryptoType = CryptoType.BTC):
+# Format a forecast as a PredictionResponse, registering its chart unless charts are skipped
+async def build_prediction_response(request: PredictionRequest, forecast: pd.DataFrame, df: pd.DataFrame, chart: bool = True) -> PredictionResponse:
+    chart_key = None
+    chart_img = None
+    if chart:
+        # Chart the last 30 days of the history the prediction was made from.
+        # Registering is cheap, the chart is rendered when /chart/{id} is first requested.
+        chart_key = register_chart(request.crypto.value, request.model_type.value, df.tail(30), forecast)
+        if request.inline_chart:
+            chart_img = base64.b64encode(await run_chart(get_chart, chart_key)).decode("utf-8")
+    
+    # Format predictions
+    daily_predictions = [
+        DailyPrediction(date=timestamp.strftime("%Y-%m-%d"), price=round(float(price), 2))
+        for timestamp, price in zip(forecast["timestamp"], forecast["predicted_close"])
+    ]
+    
+    return PredictionResponse(
+        crypto=request.crypto,
+        predictions=daily_predictions,
+        model_type=request.model_type,
+        timestamp=datetime.now().isoformat(),
+        chart_id=chart_key,
+        chart_url=f"/chart/{chart_key}" if chart_key else None,
+        chart=chart_img
+    )
+
+# Batch prediction endpoint. Items are grouped by (crypto, model type), each group
+# loads its history and model once and serves all of its items from one forecast
+# per strategy. An invalid or failing item or group does not fail the rest of the batch.
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(batch: BatchPredictionRequest):
+    results: List[Optional[BatchPredictionItem]] = [None] * len(batch.items)
+    items: Dict[int, PredictionRequest] = {}
+    groups: Dict[Tuple[CryptoType, ModelType], List[int]] = {}
+    for index, raw in enumerate(batch.items):
+        try:
+            item = PredictionRequest.model_validate(raw)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+            results[index] = BatchPredictionItem(index=index, error=f"Invalid item: {errors}")
+            continue
+        items[index] = item
+        groups.setdefault((item.crypto, item.model_type), []).append(index)
+    
+    async def run_group(crypto: CryptoType, model_type: ModelType, indices: List[int]):
+        symbol = f"{crypto.value}usdt"
+        try:
+            df = await run_io(get_historical_data, symbol, days=1000)
+            horizons = [(items[i].days, items[i].strategy.value) for i in indices]
+            forecasts, df = await run_cpu(predict_token_prices, symbol, model_type.value, horizons, df)
+        except Exception as e:
+            logger.error(f"Batch prediction error for {crypto.value} {model_type.value}: {e}")
+            for i in indices:
+                results[i] = BatchPredictionItem(index=i, error=f"Prediction error: {str(e)}")
+            return
+        
+        for i, forecast in zip(indices, forecasts):
+            try:
+                response = await build_prediction_response(items[i], forecast, df, chart=batch.charts)
+                results[i] = BatchPredictionItem(index=i, result=response)
+            except Exception as e:
+                logger.error(f"Batch prediction error for item {i}: {e}")
+                results[i] = BatchPredictionItem(index=i, error=f"Prediction error: {str(e)}")
+    
+    await asyncio.gather(*(run_group(crypto, model_type, indices) for (crypto, model_type), indices in groups.items()))
+    
+    failed = sum(1 for item in results if item.error is not None)
+    return BatchPredictionResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed,
+        timestamp=datetime.now().isoformat()
+    )
+
+# Backtest endpoint: walk-forward evaluation of a model type over the history,
+# with one error entry per horizon. Results are cached until the next candle.
+@app.post("/backtest", response_model=BacktestResponse)
+async def backtest(request: BacktestRequest):
+    symbol = f"{request.crypto.value}usdt"
     try:
-        ModelState.retraining_in_progress = True
-        symbol = f"{crypto}usdt"
+        df = await run_io(get_historical_data, symbol, days=request.days)
+        result = await run_in(
+            backtest_executor, cached_backtest, df, request.crypto.value, request.model_type.value,
+            horizon=request.horizon, strategy=request.strategy.value, window=request.window.value,
+            window_size=request.window_size, min_train=request.min_train, step=request.step
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Backtest error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Backtest error: {str(e)}")
+    return BacktestResponse(crypto=request.crypto.value, timestamp=datetime.now().isoformat(), **result)
+
+# Chart endpoint. Ids are content hashes, so an id always maps to the same image
+# and clients can revalidate with If-None-Match.
+@app.get("/chart/{chart_id}", response_class=Response, responses={200: {"content": {"image/png": {}}}})
+async def get_prediction_chart(chart_id: str, request: Request):
+    etag = f'"{chart_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400, immutable"}
+    if request.headers.get("if-none-match") in (etag, "*"):
+        return Response(status_code=304, headers=headers)
+    
+    png = await run_chart(get_chart, chart_id)
+    if png is None:
+        raise HTTPException(status_code=404, detail=f"Chart {chart_id} not found or expired, request a new prediction")
+    return Response(content=png, media_type="image/png", headers=headers)
+
+# Model retraining function, trains the model types reserved for it by /retrain
+async def retrain_models_task(crypto: CryptoType, reserved: Dict[Tuple[str, str], Future]):
+    trained = {}
+    try:
+        symbol = f"{crypto.value}usdt"
+        model_names = [model_name for _, model_name in reserved]
         logger.info(f"Starting model retraining process for {symbol}")
         
         # Get historical data
-        df = get_historical_data(symbol, days=1000)
-        
-        # Train all model types
-        for model_type in ModelType:
-            logger.info(f"Training {model_type} model for {symbol}")
-            train_model(df, model_type, symbol)
+        df = await run_io(get_historical_data, symbol, days=1000)
         
-        # Reload models
-        load_models()
+        # Train the model types, their fits run in parallel in the training pool.
+        # The event loop only awaits the result.
+        logger.info(f"Training {', '.join(model_names)} models for {symbol}")
+        # Trained models are published as soon as they are saved
+        trained = await run_in(retrain_executor, train_models, df, model_names, symbol)
         
         logger.info("Model retraining completed successfully")
     except Exception as e:
         logger.error(f"Error during model retraining: {str(e)}")
     finally:
-        ModelState.retraining_in_progress = False
+        release_retrains(reserved, trained)
 
-# Retrain endpoint
+# Retrain endpoint. Model types another run is already training are skipped,
+# 409 if that is all of them.
 @app.post("/retrain")
 async def retrain_models(background_tasks: BackgroundTasks, crypto: CryptoType = CryptoType.BTC):
-    if ModelState.retraining_in_progress:
+    reserved, in_flight = reserve_retrains(crypto.value, list(ModelType))
+    if not reserved:
         raise HTTPException(status_code=409, detail="Retraining already in progress")
     
     # Add retraining task to background tasks
     try:
-        background_tasks.add_task(retrain_models_task, crypto)
-        return {"message": f"Retraining process started for {crypto}"}
+        background_tasks.add_task(retrain_models_task, crypto, reserved)
     except Exception as e:
+        release_retrains(reserved, {})
         logger.error(f"Failed to start retraining: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to start retraining: {str(e)}")
+    
+    response = {"message": f"Retraining process started for {crypto}"}
+    if in_flight:
+        response["skipped"] = [model_name for _, model_name in in_flight]
+    return response
 
 # Model info endpoint
 @app.get("/model-info", response_model=ModelInfoResponse)
@@ -649,18 +968,21 @@ async def get_model_info():
     available_models = {}
     for crypto, models in ModelState.model_info.items():
         available_models[crypto] = list(models.keys())
+    with training_info_lock:
+        info = copy.deepcopy(training_info)
         
     return ModelInfoResponse(
         available_models=available_models,
         model_details=ModelState.model_info,
-        training_info=training_info
+        training_info=info,
+        registry=ModelState.registry.stats()
     )
 
 # Health check endpoint
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     # Count total loaded models
-    model_count = sum(len(models) for models in ModelState.models.values())
+    model_count = len(ModelState.registry)
     
     return HealthResponse(
         status="ok",
@@ -668,24 +990,106 @@ async def health_check():
         models_loaded=model_count
     )
 
+# Kept versions of a model, any of them can be rolled back to
+@app.get("/models/{crypto}/{model_type}/versions", response_model=ModelVersionsResponse)
+async def get_model_versions(crypto: CryptoType, model_type: ModelType):
+    model_dir = get_model_path(crypto.value, model_type)
+    versions = await run_io(list_versions, model_dir)
+    pointer = read_pointer(model_dir)
+    return ModelVersionsResponse(
+        crypto=crypto.value,
+        model_type=model_type.value,
+        current=pointer["version"] if pointer else None,
+        versions=versions
+    )
+
+# Rollback endpoint: serve a kept version again, the one before the current by default.
+# A retrain of a stale model publishes a new version on top of it.
+@app.post("/models/{crypto}/{model_type}/rollback", response_model=ModelVersionsResponse)
+async def rollback_model_version(crypto: CryptoType, model_type: ModelType, version: Optional[str] = Query(None, description="Version to serve")):
+    try:
+        await run_io(rollback_model, crypto.value, model_type, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return await get_model_versions(crypto, model_type)
+
+# Liveness probe: the process is up and the event loop answers
+@app.get("/health/live", response_model=LivenessResponse)
+async def liveness_check():
+    return LivenessResponse(status="ok", timestamp=datetime.now().isoformat())
+
+# Readiness probe: 503 until initialization finished and every crypto has at least one model
+@app.get("/health/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check(response: Response):
+    models = model_readiness()
+    ready = (
+        ModelState.initialization["status"] == "completed"
+        and all("ready" in states.values() for states in models.values())
+    )
+    if not ready:
+        response.status_code = 503
+    
+    return ReadinessResponse(
+        ready=ready,
+        timestamp=datetime.now().isoformat(),
+        initialization=ModelState.initialization,
+        models=models
+    )
+
+# Metrics endpoint
+@app.get("/metrics", response_model=MetricsResponse)
+async def get_metrics():
+    return MetricsResponse(
+        timestamp=datetime.now().isoformat(),
+        caches=cache_stats(),
+        exchange=bybit.stats()
+    )
+
 @app.get("/current-price/{crypto}")
 async def get_current_price(crypto: CryptoType):
     try:
-        symbol = f"{crypto}usdt"
-        session = HTTP(testnet=False)
-        
-        ticker_data = session.get_tickers(category="linear", symbol=symbol.upper())
-        
-        if ticker_data["retCode"] != 0:
-            raise HTTPException(status_code=500, detail=f"Error getting ticker data: {ticker_data['retMsg']}")
-            
-        last_price = float(ticker_data["result"]["list"][0]["lastPrice"])
+        symbol = f"{crypto.value}usdt"
+        ticker = await run_io(get_last_price, symbol)
         
         return {
             "crypto": crypto,
-            "price": last_price,
+            "price": ticker["price"],
+            "source": ticker["source"],
+            "updated_at": datetime.fromtimestamp(ticker["updated_at"]).isoformat(),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Error getting current price: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting current price: {str(e)}")
+
+# Last prices of several cryptos in one request, e.g. /current-prices?symbols=btc,eth (all supported cryptos by default).
+# Unsupported cryptos and failed fetches are reported in their own entry, the other prices are still returned.
+@app.get("/current-prices")
+async def get_current_prices(symbols: Optional[str] = Query(None, description="Comma separated cryptos, e.g. btc,eth")):
+    names = list(dict.fromkeys(name.strip().lower() for name in symbols.split(",") if name.strip())) if symbols else [crypto.value for crypto in CryptoType]
+    supported = {crypto.value for crypto in CryptoType}
+    cryptos = [CryptoType(name) for name in names if name in supported]
+    
+    # Cached prices come back at once, misses are fetched concurrently
+    tickers = await asyncio.gather(
+        *(run_io(get_last_price, f"{crypto.value}usdt") for crypto in cryptos),
+        return_exceptions=True
+    )
+    
+    # Entries in request order
+    prices = {name: {"error": f"Unsupported crypto: {name}"} for name in names}
+    for crypto, ticker in zip(cryptos, tickers):
+        if isinstance(ticker, Exception):
+            logger.error(f"Error getting current price for {crypto.value}: {ticker}")
+            prices[crypto.value] = {"error": str(ticker)}
+        else:
+            prices[crypto.value] = {
+                "price": ticker["price"],
+                "source": ticker["source"],
+                "updated_at": datetime.fromtimestamp(ticker["updated_at"]).isoformat()
+            }
+    
+    return {
+        "prices": prices,
+        "timestamp": datetime.now().isoformat()
+    }
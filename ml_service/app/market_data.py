@@ -0,0 +1,223 @@
+# ml_service/app/market_data.py
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    CANDLES_DIR,
+    BACKFILL_WORKERS,
+    DATA_CACHE_SIZE,
+    CANDLE_CLOSE_GRACE_SECONDS,
+    CANDLE_RETRY_SECONDS,
+)
+from .cache import TTLCache
+from .backfill import fetch_range
+from .exchange import bybit, ExchangeUnavailable
+from .candle_store import (
+    CandleStore,
+    PRICE_COLUMNS,
+    candle_open_time,
+    interval_to_ms,
+    last_closed_open_time,
+)
+
+
+logger = logging.getLogger("ml-service")
+
+# Shared on-disk candle store
+candle_store = CandleStore(CANDLES_DIR)
+
+# Prepared frames per (symbol, interval): (frame, capacity in rows, last candle timestamp in ms)
+_frames: Dict[tuple, Tuple[pd.DataFrame, int, Optional[int]]] = {}
+
+# Ready-to-use history windows, shared by concurrent requests
+history_cache = TTLCache("historical_data", maxsize=DATA_CACHE_SIZE)
+
+
+def normalize_symbol(symbol: str) -> str:
+    # Always convert symbol to uppercase
+    symbol = symbol.upper()
+    if not symbol.endswith("USDT"):
+        symbol = symbol + "USDT"
+    return symbol
+
+
+def fetch_klines(symbol: str, interval: str, start_ms: int, end_ms: int, limit: int) -> Dict[str, np.ndarray]:
+    """Download one page of candles from Bybit and return them as column arrays sorted by time."""
+    response = bybit.get_kline(symbol=symbol, interval=interval, start=start_ms, end=end_ms, limit=limit)
+
+    if response["retCode"] != 0:
+        logger.error(f"Error fetching data from Bybit: {response['retMsg']}")
+        raise Exception(f"Bybit API error: {response['retMsg']}")
+
+    raw = response["result"]["list"]
+    if not raw:
+        return {"timestamp": np.empty(0, dtype=np.int64), **{c: np.empty(0) for c in PRICE_COLUMNS}}
+
+    # Bybit returns [start, open, high, low, close, volume, turnover] newest first
+    values = np.array(raw, dtype=np.float64)[::-1]
+    candles = {"timestamp": values[:, 0].astype(np.int64)}
+    for i, column in enumerate(PRICE_COLUMNS, start=1):
+        candles[column] = values[:, i]
+    return candles
+
+
+def _closed_only(candles: Dict[str, np.ndarray], last_closed_ts: int) -> Dict[str, np.ndarray]:
+    # The newest candle from the exchange is usually still open and must not be persisted
+    mask = candles["timestamp"] <= last_closed_ts
+    return {column: values[mask] for column, values in candles.items()}
+
+
+def sync_candles(symbol: str, interval: str, days: int):
+    """Make sure the local store holds every closed candle of the last ``days`` periods."""
+    step = interval_to_ms(interval)
+    now_ms = int(datetime.now().timestamp() * 1000)
+    last_closed_ts = last_closed_open_time(now_ms, interval)
+    window_start = last_closed_ts - (days - 1) * step
+    # Stop at the close of the last closed candle so the open one never costs an extra page
+    end_ms = last_closed_ts + step - 1
+
+    with candle_store.lock(symbol, interval):
+        meta = candle_store.get_meta(symbol, interval)
+        last_ts = candle_store.last_timestamp(symbol, interval)
+        history_start = meta.get("history_start")
+
+        covered = history_start is not None and history_start <= window_start
+        up_to_date = last_ts is not None and last_ts >= last_closed_ts
+        if covered and up_to_date:
+            return
+
+        if covered:
+            # Delta sync: only ask for candles after the last stored one
+            missing = (last_closed_ts - last_ts) // step
+            logger.info(f"Fetching {missing} new {interval} candles for {symbol} from Bybit")
+            candles = _closed_only(fetch_range(fetch_klines, symbol, interval, last_ts + 1, end_ms), last_closed_ts)
+            added = candle_store.append(symbol, interval, candles)
+        else:
+            # The window reaches further back than anything we stored so far
+            logger.info(f"Fetching {days} {interval} candles for {symbol} from Bybit")
+            candles = _closed_only(fetch_range(fetch_klines, symbol, interval, window_start, end_ms), last_closed_ts)
+            added = candle_store.merge(symbol, interval, candles)
+            candle_store.set_meta(symbol, interval, history_start=window_start)
+            _frames.pop((symbol, interval), None)
+        logger.info(f"Stored {added} new {interval} candles for {symbol}")
+
+
+def candles_to_frame(candles: Dict[str, np.ndarray]) -> pd.DataFrame:
+    df = pd.DataFrame({column: candles[column] for column in PRICE_COLUMNS})
+    df.insert(0, "timestamp", pd.to_datetime(candles["timestamp"], unit="ms"))
+
+    # Add target column for prediction (next period's close price),
+    # the latest candle has no target yet
+    df["target"] = df["close"].shift(-1)
+    return df
+
+
+def _extend_frame(frame: pd.DataFrame, candles: Dict[str, np.ndarray], capacity: int) -> pd.DataFrame:
+    # Merge a delta into a prepared frame: only the new rows are converted and
+    # only the previous last row gets its target filled in
+    delta = candles_to_frame(candles)
+    old_len = len(frame)
+    frame = pd.concat([frame, delta], ignore_index=True)
+    frame.loc[old_len - 1, "target"] = frame.loc[old_len, "close"]
+    if len(frame) > capacity:
+        frame = frame.iloc[-capacity:].reset_index(drop=True)
+    return frame
+
+
+def _load_frame(symbol: str, interval: str, days: int) -> pd.DataFrame:
+    # Caller must hold the store lock for (symbol, interval)
+    key = (symbol, interval)
+    last_ts = candle_store.last_timestamp(symbol, interval)
+    frame, capacity, frame_last_ts = _frames.get(key, (None, 0, None))
+
+    if frame is not None and capacity >= days and last_ts is not None and frame_last_ts is not None:
+        if last_ts > frame_last_ts:
+            # Read one row more than needed so the delta overlaps the frame even across exchange gaps
+            missing = (last_ts - frame_last_ts) // interval_to_ms(interval)
+            candles = candle_store.read(symbol, interval, limit=missing + 1)
+            if candles["timestamp"][0] <= frame_last_ts:
+                mask = candles["timestamp"] > frame_last_ts
+                candles = {column: values[mask] for column, values in candles.items()}
+                frame = _extend_frame(frame, candles, capacity)
+                frame_last_ts = last_ts
+            else:
+                frame = None
+        elif last_ts < frame_last_ts:
+            # Store was rebuilt underneath us
+            frame = None
+    else:
+        frame = None
+
+    if frame is None:
+        capacity = max(capacity, days)
+        frame = candles_to_frame(candle_store.read(symbol, interval, limit=capacity))
+        frame_last_ts = last_ts
+
+    _frames[key] = (frame, capacity, frame_last_ts)
+    return frame
+
+
+def sync_many(symbols: List[str], interval: str = "D", days: int = 1000):
+    """Backfill several symbols at once, pages of every symbol share the Bybit rate limit."""
+    symbols = [normalize_symbol(symbol) for symbol in symbols]
+    with ThreadPoolExecutor(max_workers=max(1, min(BACKFILL_WORKERS, len(symbols)))) as executor:
+        futures = {symbol: executor.submit(sync_candles, symbol, interval, days) for symbol in symbols}
+    for symbol, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Error backfilling {symbol}: {e}")
+
+
+def _frame_expiry(interval: str, df: pd.DataFrame) -> float:
+    # A window stays valid until the next candle closes. If the exchange has not
+    # published the latest closed candle yet, try again shortly instead.
+    now = datetime.now().timestamp()
+    now_ms = int(now * 1000)
+    if len(df) and int(df["timestamp"].iloc[-1].value // 1_000_000) < last_closed_open_time(now_ms, interval):
+        return now + CANDLE_RETRY_SECONDS
+    next_close_ms = candle_open_time(now_ms, interval) + interval_to_ms(interval)
+    return next_close_ms / 1000 + CANDLE_CLOSE_GRACE_SECONDS
+
+
+def _load_historical_data(symbol: str, days: int, interval: str) -> pd.DataFrame:
+    with candle_store.lock(symbol, interval):
+        try:
+            sync_candles(symbol, interval, days)
+        except ExchangeUnavailable as e:
+            # Serve what we have, the frame expires early so the next request tries the exchange again
+            if not candle_store.count(symbol, interval):
+                raise
+            logger.warning(f"{e}, serving stored {interval} candles for {symbol}")
+        df = _load_frame(symbol, interval, days).iloc[-days:]
+    logger.info(f"Loaded {len(df)} {interval} candles for {symbol} from the candle store")
+    return df
+
+
+def last_stored_candle(symbol: str, interval: str = "D") -> Optional[Dict[str, float]]:
+    """Newest closed candle in the local store, None if nothing is stored for the symbol."""
+    symbol = normalize_symbol(symbol)
+    candles = candle_store.read(symbol, interval, limit=1)
+    if not len(candles["timestamp"]):
+        return None
+    return {column: values[-1].item() for column, values in candles.items()}
+
+
+# Data fetching function, backed by the local candle store
+def get_historical_data(symbol: str, days: int = 1000, interval: str = "D"):
+    symbol = normalize_symbol(symbol)
+
+    try:
+        return history_cache.get_or_load(
+            (symbol, interval, days),
+            lambda: _load_historical_data(symbol, days, interval),
+            expires_at=lambda df: _frame_expiry(interval, df),
+        )
+    except Exception as e:
+        logger.error(f"Error in get_historical_data: {e}")
+        raise e
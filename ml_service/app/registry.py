@@ -0,0 +1,284 @@
+# ml_service/app/registry.py
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from .artifacts import save_artifact, is_artifact, read_manifest, artifact_size
+
+
+logger = logging.getLogger("ml-service")
+
+# A model directory holds every kept version and a pointer to the published one:
+#   <model dir>/versions/<version>/   artifact directories, see artifacts.py
+#   <model dir>/current.json          {"version": ..., "history": [newest first], ...}
+VERSIONS_DIR = "versions"
+POINTER_FILE = "current.json"
+
+# Serialises publishes and rollbacks of the same model directory within the process
+_publish_locks: Dict[str, threading.Lock] = {}
+_publish_locks_lock = threading.Lock()
+# Parsed pointers keyed by model directory, re-read when the pointer file is replaced
+_pointer_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+def _publish_lock(model_dir: str) -> threading.Lock:
+    with _publish_locks_lock:
+        return _publish_locks.setdefault(model_dir, threading.Lock())
+
+
+def version_path(model_dir: str, version: str) -> str:
+    return os.path.join(model_dir, VERSIONS_DIR, version)
+
+
+def read_pointer(model_dir: str) -> Optional[Dict[str, Any]]:
+    """The published pointer of a model directory, None if nothing was published.
+
+    Called on every prediction, so the file is only parsed again after it was replaced.
+    """
+    try:
+        stats = os.stat(os.path.join(model_dir, POINTER_FILE))
+    except FileNotFoundError:
+        return None
+    key = (stats.st_ino, stats.st_mtime_ns)
+    cached = _pointer_cache.get(model_dir)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(os.path.join(model_dir, POINTER_FILE)) as f:
+        pointer = json.load(f)
+    _pointer_cache[model_dir] = (key, pointer)
+    return pointer
+
+
+def _write_pointer(model_dir: str, version: str, history: List[str]):
+    # Written aside and renamed over the old pointer, readers see the old or the new one, never a mix
+    pointer = {"version": version, "history": history, "updated_at": datetime.now().isoformat()}
+    tmp_path = os.path.join(model_dir, f"{POINTER_FILE}.tmp-{os.getpid()}-{threading.get_ident()}")
+    with open(tmp_path, "w") as f:
+        json.dump(pointer, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(model_dir, POINTER_FILE))
+
+
+def _new_version_id() -> str:
+    # Sorts by creation time, unique within a model directory since publishes are serialised
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def _adopt_unversioned(model_dir: str) -> Optional[str]:
+    # Artifacts saved before versioning sit directly in the model directory, move them into a version
+    if not is_artifact(model_dir):
+        return None
+    version = _new_version_id()
+    target = version_path(model_dir, version)
+    os.makedirs(target)
+    for name in os.listdir(model_dir):
+        if name not in (VERSIONS_DIR, POINTER_FILE) and not name.startswith(f"{POINTER_FILE}.tmp-"):
+            os.rename(os.path.join(model_dir, name), os.path.join(target, name))
+    logger.info(f"Moved unversioned model artifact {model_dir} to version {version}")
+    return version
+
+
+def _prune_versions(model_dir: str, keep: List[str]) -> List[str]:
+    # Version ids have no dots, names with one are artifacts still being written
+    removed = []
+    for name in os.listdir(os.path.join(model_dir, VERSIONS_DIR)):
+        if "." not in name and name not in keep:
+            # Readers that still have the version memory-mapped keep working, its files are only unlinked
+            shutil.rmtree(version_path(model_dir, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+def publish_version(model_dir: str, models: Dict[str, Any], metadata: Dict[str, Any], keep: int) -> Tuple[str, str]:
+    """Save a bundle as a new version of ``model_dir`` and publish it.
+
+    The version is written completely under a fresh name first, then the
+    pointer is atomically replaced, so a reader resolves either the previous
+    version or the new one. Only the ``keep`` most recently published
+    versions stay on disk. Returns the version id and its path.
+    """
+    with _publish_lock(model_dir):
+        os.makedirs(os.path.join(model_dir, VERSIONS_DIR), exist_ok=True)
+        pointer = read_pointer(model_dir)
+        history = list(pointer["history"]) if pointer else []
+        adopted = _adopt_unversioned(model_dir)
+        if adopted:
+            history.insert(0, adopted)
+
+        version = _new_version_id()
+        path = version_path(model_dir, version)
+        save_artifact(path, models, {**metadata, "version": version})
+
+        history = [version] + [v for v in history if v != version][:max(keep, 1) - 1]
+        _write_pointer(model_dir, version, history)
+        removed = _prune_versions(model_dir, history)
+        if removed:
+            logger.info(f"Removed old model versions {', '.join(sorted(removed))} of {model_dir}")
+        return version, path
+
+
+def set_current_version(model_dir: str, version: str) -> str:
+    """Point ``model_dir`` at one of its kept versions, e.g. to roll back. Returns the version's path."""
+    with _publish_lock(model_dir):
+        pointer = read_pointer(model_dir)
+        if pointer is None or version not in pointer["history"] or not is_artifact(version_path(model_dir, version)):
+            raise ValueError(f"Version {version} of {os.path.basename(model_dir)} is not kept")
+        _write_pointer(model_dir, version, pointer["history"])
+        return version_path(model_dir, version)
+
+
+def list_versions(model_dir: str) -> List[Dict[str, Any]]:
+    """Kept versions of a model directory, newest first, with their manifest metadata."""
+    pointer = read_pointer(model_dir)
+    if pointer is None:
+        return []
+    versions = []
+    for version in pointer["history"]:
+        path = version_path(model_dir, version)
+        if not is_artifact(path):
+            continue
+        manifest = read_manifest(path)
+        versions.append({
+            "version": version,
+            "current": version == pointer["version"],
+            "created_at": manifest.get("created_at"),
+            "accuracy": manifest.get("accuracy"),
+            "size_mb": round(artifact_size(path) / 2**20, 2),
+        })
+    return versions
+
+
+class ResidentModel(NamedTuple):
+    model: Any
+    version: str
+    nbytes: int
+    loaded_at: float
+
+
+class ModelRegistry:
+    """Models held in memory, loaded on first use and evicted least recently used first.
+
+    Each entry is one stored model version. Once the approximate size of all
+    resident models exceeds ``budget_bytes`` the least recently used ones are
+    dropped, they are loaded again on their next use. The entry just loaded or
+    published is never evicted, so a single model larger than the budget still
+    serves. A budget of 0 or less means no limit.
+
+    Readers never take a lock when the model is resident: entries are
+    immutable and swapped by a single dict assignment, so a request keeps the
+    version it looked up while a newly published one replaces it for the
+    next. Loads are single-flight per key: concurrent requests for a model
+    that is not resident wait for one load instead of each reading it from disk.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: Dict[Hashable, ResidentModel] = {}
+        self._last_used: Dict[Hashable, float] = {}
+        # Guards writers (puts, evictions, discards) and counters other than hits
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        # Counted without the lock, approximate under contention
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _lookup(self, key: Hashable, version: str) -> Optional[ResidentModel]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        self._last_used[key] = time.time()
+        return entry
+
+    def get(self, key: Hashable, version: str, loader: Callable[[], Tuple[Any, int]]) -> ResidentModel:
+        """Resident model of ``key`` at ``version``. If it is not resident yet ``loader()``
+        reads it and returns it along with its approximate size in bytes."""
+        entry = self._lookup(key, version)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another request may have loaded this version while we were waiting
+            entry = self._lookup(key, version)
+            if entry is not None:
+                return entry
+
+            started = time.perf_counter()
+            model, nbytes = loader()
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += time.perf_counter() - started
+            return self.put(key, model, version, nbytes)
+
+    def put(self, key: Hashable, model: Any, version: str, nbytes: int) -> ResidentModel:
+        """Make ``model`` the resident version of ``key``, replacing any other version."""
+        entry = ResidentModel(model, version, nbytes, time.time())
+        with self._lock:
+            self._last_used[key] = entry.loaded_at
+            self._entries[key] = entry
+            self._evict(keep=key)
+        return entry
+
+    def _evict(self, keep: Hashable):
+        # Caller must hold self._lock
+        if self.budget_bytes <= 0:
+            return
+        while len(self._entries) > 1 and self.resident_bytes > self.budget_bytes:
+            last_used = dict(self._last_used)
+            key = min((k for k in self._entries if k != keep), key=lambda k: last_used.get(k, 0.0))
+            entry = self._entries.pop(key)
+            self._last_used.pop(key, None)
+            self.evictions += 1
+            logger.info(f"Evicted model {key} version {entry.version} ({entry.nbytes / 2**20:.1f} MB) from memory")
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._last_used.pop(key, None)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry.nbytes for entry in list(self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = dict(self._entries)
+            last_used = dict(self._last_used)
+        # Least recently used first, the order entries are evicted in
+        resident = sorted(entries.items(), key=lambda item: last_used.get(item[0], 0.0))
+        return {
+            "budget_mb": round(self.budget_bytes / 2**20, 2) if self.budget_bytes > 0 else None,
+            "resident_mb": round(sum(entry.nbytes for entry in entries.values()) / 2**20, 2),
+            "resident_models": len(entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "load_seconds": round(self.load_seconds, 3),
+            "evictions": self.evictions,
+            "resident": [
+                {
+                    "key": key,
+                    "version": entry.version,
+                    "size_mb": round(entry.nbytes / 2**20, 2),
+                    "loaded_at": datetime.fromtimestamp(entry.loaded_at).isoformat(),
+                    "last_used": datetime.fromtimestamp(last_used.get(key, entry.loaded_at)).isoformat(),
+                }
+                for key, entry in resident
+            ],
+        }
@@ -0,0 +1,52 @@
+# ml_service/app/tickers.py
+import time
+import logging
+from typing import Any, Dict, List
+
+from .config import TICKER_TTL_SECONDS
+from .cache import TTLCache
+from .exchange import bybit, ExchangeUnavailable
+from .market_data import normalize_symbol, last_stored_candle
+
+
+logger = logging.getLogger("ml-service")
+
+# Last price per symbol: {"price", "source", "updated_at"}
+ticker_cache = TTLCache("tickers")
+
+
+def fetch_last_price(symbol: str) -> Dict[str, Any]:
+    """Last traded price from Bybit, blocking. Falls back to the last stored close while the exchange is unavailable."""
+    symbol = normalize_symbol(symbol)
+    try:
+        ticker_data = bybit.get_tickers(symbol=symbol)
+        price, source = float(ticker_data["result"]["list"][0]["lastPrice"]), "exchange"
+    except ExchangeUnavailable as e:
+        candle = last_stored_candle(symbol)
+        if candle is None:
+            raise
+        logger.warning(f"{e}, serving the last stored close for {symbol}")
+        price, source = candle["close"], "candles"
+    return {"price": price, "source": source, "updated_at": time.time()}
+
+
+def _ticker_expiry(ticker: Dict[str, Any]) -> float:
+    return ticker["updated_at"] + TICKER_TTL_SECONDS
+
+
+def get_last_price(symbol: str) -> Dict[str, Any]:
+    """Cached last price, concurrent misses for one symbol share a single exchange call."""
+    symbol = normalize_symbol(symbol)
+    return ticker_cache.get_or_load(symbol, lambda: fetch_last_price(symbol), expires_at=_ticker_expiry)
+
+
+def refresh_tickers(symbols: List[str]):
+    """Re-fetch the given symbols so readers keep hitting a warm cache."""
+    for symbol in symbols:
+        symbol = normalize_symbol(symbol)
+        try:
+            ticker = fetch_last_price(symbol)
+            ticker_cache.set(symbol, ticker, _ticker_expiry(ticker))
+        except Exception as e:
+            # The cached price expires on its own, readers then hit the exchange themselves
+            logger.warning(f"Error refreshing ticker for {symbol}: {e}")
@@ -0,0 +1,282 @@
+# ml_service/app/training.py
+import os
+import math
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import TRAINING_WORKERS, PROPHET_UNCERTAINTY_SAMPLES, PROPHET_WARM_START_MIN_OVERLAP
+from .features import FeaturePipeline
+from .forecasting import AUX_INDICES, CLOSE_INDEX, MAX_HORIZON
+
+
+logger = logging.getLogger("ml-service")
+
+# Estimators that make up a non-Prophet model bundle
+ESTIMATOR_KINDS = ["features", "close", "direct"]
+
+# Chronological hold-out used for the MAE reported after training
+TEST_SIZE = 0.2
+
+# Threads each fit may use so the pool does not oversubscribe the CPU
+FIT_THREADS = max(1, (os.cpu_count() or 1) // max(TRAINING_WORKERS, 1))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_class(model_name: str):
+    if model_name == "random_forest":
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor
+    if model_name == "xgboost":
+        import xgboost as xgb
+        return xgb.XGBRegressor
+    if model_name == "lightgbm":
+        import lightgbm as lgb
+        return lgb.LGBMRegressor
+    raise ValueError(f"Model {model_name} not supported")
+
+
+def make_close_model(model_name: str, n_jobs: Optional[int] = None):
+    return get_model_class(model_name)(n_estimators=100, random_state=42, n_jobs=n_jobs)
+
+
+def make_multi_output_model(model_name: str, n_jobs: Optional[int] = None):
+    """Estimator that predicts several targets (next-step features or horizons) in a single predict call."""
+    from sklearn.compose import TransformedTargetRegressor
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    estimator = get_model_class(model_name)(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    if model_name == "lightgbm":
+        # LightGBM has no multi-output objective, one booster per target behind one predict
+        return MultiOutputRegressor(estimator)
+    if model_name == "random_forest":
+        # Forest splits minimise the squared error summed over outputs,
+        # standardise targets so e.g. turnover does not drown out open/high/low
+        return TransformedTargetRegressor(regressor=estimator, transformer=StandardScaler(), check_inverse=False)
+    # XGBoost grows separate trees for every output natively
+    return estimator
+
+
+def prepare_training_data(df: pd.DataFrame, pipeline: FeaturePipeline) -> Dict[str, tuple]:
+    """Build the feature matrix once and derive the (X, y) pair of every estimator kind from it.
+
+    ``df`` must be clean and sorted by time. Rows before the pipeline's warmup
+    are dropped, the candle columns come first so targets are read from the
+    same matrix. All pairs are views of the same array.
+    """
+    X = pipeline.transform(df)[pipeline.warmup:]
+    n = len(X)
+    horizons = np.column_stack([X[h:n - MAX_HORIZON + h, CLOSE_INDEX] for h in range(1, MAX_HORIZON + 1)])
+    return {
+        # Next-step open, high, low, volume, turnover
+        "features": (X[:-1], X[1:, AUX_INDICES]),
+        # Next-step close (main target)
+        "close": (X[:-1], X[1:, CLOSE_INDEX]),
+        # Close at every horizon 1..MAX_HORIZON
+        "direct": (X[:-MAX_HORIZON], horizons),
+    }
+
+
+def _split(X: np.ndarray, y: np.ndarray):
+    # Same split as train_test_split(test_size=0.2, shuffle=False)
+    n_test = math.ceil(len(X) * TEST_SIZE)
+    return X[:-n_test], y[:-n_test], X[-n_test:], y[-n_test:]
+
+
+def fit_estimator(model_name: str, kind: str, X: np.ndarray, y: np.ndarray, n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """Fit one estimator of a bundle and measure it on the hold-out, runs in a training worker."""
+    started = time.perf_counter()
+    X_train, y_train, X_test, y_test = _split(X, y)
+
+    model = make_close_model(model_name, n_jobs) if kind == "close" else make_multi_output_model(model_name, n_jobs)
+    model.fit(X_train, y_train)
+
+    y_pred = np.asarray(model.predict(X_test)).reshape(y_test.shape)
+    mae = np.abs(y_test - y_pred).mean(axis=0)
+    return {"model": model, "mae": mae, "seconds": time.perf_counter() - started}
+
+
+def warm_start_params(model) -> Dict[str, Any]:
+    """Fitted parameters of a Prophet model and the history they were fitted on, JSON serialisable.
+
+    A later fit on a similar history starts its optimisation where this one
+    ended instead of from Prophet's default initialisation, see "Updating
+    fitted models" in the Prophet docs.
+    """
+    params = {}
+    for name in ["k", "m", "sigma_obs"]:
+        params[name] = float(np.mean(model.params[name]))
+    for name in ["delta", "beta"]:
+        params[name] = np.mean(model.params[name], axis=0).tolist()
+    return {
+        "params": params,
+        "start": model.history["ds"].min().isoformat(),
+        "end": model.history["ds"].max().isoformat(),
+    }
+
+
+def _history_overlap(warm_start: Dict[str, Any], df_p: pd.DataFrame) -> float:
+    # Share of the longer of the two histories both cover, 1.0 for identical ones
+    start, end = df_p["ds"].iloc[0], df_p["ds"].iloc[-1]
+    warm_start_start, warm_start_end = pd.Timestamp(warm_start["start"]), pd.Timestamp(warm_start["end"])
+    longest = max(end - start, warm_start_end - warm_start_start)
+    if longest <= pd.Timedelta(0):
+        return 0.0
+    overlap = min(end, warm_start_end) - max(start, warm_start_start)
+    return max(overlap / longest, 0.0)
+
+
+def fit_prophet_model(df_p: pd.DataFrame, warm_start: Optional[Dict[str, Any]] = None):
+    """Fit one Prophet model on ``df_p`` (ds, y), returns (model, warm started).
+
+    Parameters fitted on a much shorter or shifted history are a poor
+    starting point, those fits start cold.
+    """
+    from prophet import Prophet
+
+    if warm_start is not None and _history_overlap(warm_start, df_p) >= PROPHET_WARM_START_MIN_OVERLAP:
+        try:
+            model = Prophet(uncertainty_samples=PROPHET_UNCERTAINTY_SAMPLES)
+            init = {name: np.asarray(value) for name, value in warm_start["params"].items()}
+            return model.fit(df_p, init=init), True
+        except Exception as e:
+            logger.warning(f"Prophet warm start failed ({e}), fitting from scratch")
+    return Prophet(uncertainty_samples=PROPHET_UNCERTAINTY_SAMPLES).fit(df_p), False
+
+
+def fit_prophet(df_p: pd.DataFrame, warm_start: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Measure Prophet on the last 20% of ``df_p`` (ds, y), then fit the served model on all of it.
+
+    Forecasts start after the last candle, so the served model has to have
+    seen it. ``warm_start`` holds warm_start_params of the previous run's
+    ``holdout`` fit and served ``model``, each fit starts from its counterpart.
+    The returned ``warm_start`` keeps the hold-out fit's parameters for the next run.
+    """
+    warm_start = warm_start or {}
+    started = time.perf_counter()
+    test_size = int(len(df_p) * TEST_SIZE)
+    train_df = df_p[:-test_size]
+    test_df = df_p[-test_size:]
+
+    holdout_model, holdout_warm = fit_prophet_model(train_df, warm_start.get("holdout"))
+
+    # Predict the hold-out dates only
+    y_pred = holdout_model.predict(test_df[["ds"]])["yhat"].values
+    y_true = test_df["y"].values
+    mae = float(np.abs(y_true - y_pred).mean())
+
+    model, model_warm = fit_prophet_model(df_p, warm_start.get("model"))
+    return {
+        "model": model,
+        "mae": mae,
+        "seconds": time.perf_counter() - started,
+        "warm_started": {"holdout": holdout_warm, "model": model_warm},
+        "warm_start": {"holdout": warm_start_params(holdout_model)},
+    }
+
+
+def get_training_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if TRAINING_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers only import this module, not the web app, and are safe to
+            # start from a process that already runs threads
+            _pool = ProcessPoolExecutor(
+                max_workers=TRAINING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_training_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _run_inline(fn, *args) -> Future:
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def submit_training(fn, *args) -> Future:
+    """Run ``fn(*args)`` in the training pool, or inline when the pool is disabled."""
+    pool = get_training_pool()
+    if pool is None:
+        return _run_inline(fn, *args)
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        # A worker died during an earlier run, start a fresh pool
+        _reset_training_pool()
+        return get_training_pool().submit(fn, *args)
+
+
+def train_bundles(df: pd.DataFrame, model_names: List[str], prophet_warm_start: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Fit every estimator of every requested model type in parallel on one prepared feature matrix.
+
+    Returns, per model type, the fitted ``models`` bundle, the hold-out ``mae`` and
+    ``timings`` of each fit, and the ``wall_clock_seconds`` of the whole run.
+    A model type whose fit failed carries an ``error`` instead of models.
+    Prophet is warm-started from ``prophet_warm_start`` when given, see fit_prophet.
+    """
+    started = time.perf_counter()
+    pipeline = FeaturePipeline()
+    data = prepare_training_data(df, pipeline)
+
+    futures = {}
+    for model_name in model_names:
+        if model_name == "prophet":
+            # Prophet requires specific format
+            df_p = df[["timestamp", "close"]].rename(columns={"timestamp": "ds", "close": "y"})
+            futures[(model_name, "prophet")] = submit_training(fit_prophet, df_p, prophet_warm_start)
+            continue
+        for kind in ESTIMATOR_KINDS:
+            X, y = data[kind]
+            futures[(model_name, kind)] = submit_training(fit_estimator, model_name, kind, X, y, FIT_THREADS)
+
+    results = {}
+    for (model_name, kind), future in futures.items():
+        if model_name not in results:
+            # Serving builds its inputs with the pipeline the estimators were trained on
+            models = {} if model_name == "prophet" else {"pipeline": pipeline}
+            results[model_name] = {"models": models, "mae": {}, "timings": {}}
+        bundle = results[model_name]
+        try:
+            fitted = future.result()
+        except BrokenProcessPool as e:
+            # A worker died, start a fresh pool next time
+            _reset_training_pool()
+            bundle["error"] = e
+            continue
+        except Exception as e:
+            bundle["error"] = e
+            continue
+        bundle["models"][kind] = fitted["model"]
+        bundle["mae"][kind] = fitted["mae"]
+        bundle["timings"][kind] = round(fitted["seconds"], 3)
+        if "warm_start" in fitted:
+            bundle["warm_started"] = fitted["warm_started"]
+            bundle["warm_start"] = fitted["warm_start"]
+
+    wall_clock = round(time.perf_counter() - started, 3)
+    for bundle in results.values():
+        bundle["wall_clock_seconds"] = wall_clock
+    logger.info(f"Trained {', '.join(model_names)} in {wall_clock:.2f}s")
+    return results
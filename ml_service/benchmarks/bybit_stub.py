@@ -0,0 +1,131 @@
+# ml_service/benchmarks/bybit_stub.py
+"""Local stand-in for the Bybit v5 market endpoints the service uses.
+
+Serves /v5/market/kline and /v5/market/tickers with deterministic synthetic
+candles, so the service, the benchmarks and the exchange client can run
+without network access. Latency and failures can be injected to exercise
+retries and the circuit breaker, also while running:
+
+    GET /stub/config?fail_rate=1.0     every request fails with HTTP 503
+    GET /stub/config?fail_rate=0       back to normal
+    GET /stub/stats                    requests served and failed
+
+Run from the ml_service directory and point the service at it:
+
+    python benchmarks/bybit_stub.py --port 9000
+    ML_BYBIT_BASE_URL=http://localhost:9000 uvicorn app.main:app
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+
+INTERVAL_MS = {"D": 86_400_000, "W": 7 * 86_400_000, "60": 3_600_000, "15": 900_000, "5": 300_000, "1": 60_000}
+BASE_PRICES = {"BTCUSDT": 30000.0, "ETHUSDT": 2000.0}
+
+config = {"fail_rate": 0.0, "latency_ms": 0.0}
+stats = {"requests": 0, "failed": 0}
+stats_lock = threading.Lock()
+
+
+def candles(symbol: str, interval: str, start: int, end: int, limit: int):
+    """Rows [start, open, high, low, close, volume, turnover] newest first, like Bybit."""
+    step = INTERVAL_MS[interval]
+    now = int(time.time() * 1000)
+    end = min(end, now)
+    # Without a start Bybit returns the latest ``limit`` candles
+    first = -(-start // step) * step if start else (end // step - limit + 1) * step
+    timestamps = np.arange(first, end + 1, step, dtype=np.int64)[-limit:]
+    # A smooth price path that only depends on the candle time, so every page agrees
+    t = timestamps / step
+    close = BASE_PRICES.get(symbol, 100.0) * (1 + 0.2 * np.sin(t / 50.0) + 0.03 * np.sin(t / 3.0))
+    open_ = BASE_PRICES.get(symbol, 100.0) * (1 + 0.2 * np.sin((t - 1) / 50.0) + 0.03 * np.sin((t - 1) / 3.0))
+    volume = 1000 + 100 * np.cos(t / 7.0) ** 2
+    rows = [
+        [str(ts), f"{o:.2f}", f"{max(o, c) * 1.01:.2f}", f"{min(o, c) * 0.99:.2f}", f"{c:.2f}", f"{v:.3f}", f"{v * c:.2f}"]
+        for ts, o, c, v in zip(timestamps, open_, close, volume)
+    ]
+    return rows[::-1]
+
+
+def ok(result):
+    return {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": {}, "time": int(time.time() * 1000)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/stub/config":
+            for key in config:
+                if key in query:
+                    config[key] = float(query[key])
+            return self.send_json(config)
+        if url.path == "/stub/stats":
+            with stats_lock:
+                return self.send_json(stats)
+
+        with stats_lock:
+            stats["requests"] += 1
+        if config["latency_ms"]:
+            time.sleep(config["latency_ms"] / 1000)
+        if random.random() < config["fail_rate"]:
+            with stats_lock:
+                stats["failed"] += 1
+            return self.send_json({"error": "injected failure"}, status=503)
+
+        symbol = query.get("symbol", "BTCUSDT")
+        if url.path == "/v5/market/kline":
+            rows = candles(
+                symbol,
+                query.get("interval", "D"),
+                int(query.get("start", 0)),
+                int(query.get("end", time.time() * 1000)),
+                int(query.get("limit", 200)),
+            )
+            return self.send_json(ok({"category": "linear", "symbol": symbol, "list": rows}))
+        if url.path == "/v5/market/tickers":
+            symbols = [symbol] if "symbol" in query else list(BASE_PRICES)
+            tickers = [
+                {"symbol": name, "lastPrice": candles(name, "1", 0, int(time.time() * 1000), 1)[0][4]}
+                for name in symbols
+            ]
+            return self.send_json(ok({"category": "linear", "list": tickers}))
+        return self.send_json({"retCode": 10001, "retMsg": f"Unknown path {url.path}", "result": {}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every exchange request")
+    args = parser.parse_args()
+    config.update(fail_rate=args.fail_rate, latency_ms=args.latency_ms)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"Bybit stub listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# ml_service/benchmarks/common.py
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Make "app" importable when a benchmark is run as a plain script
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+
+def synthetic_history(days: int = 1000, seed: int = 42) -> pd.DataFrame:
+    """Random-walk daily candles shaped like get_historical_data() output."""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.01, days)) * close
+    volume = rng.uniform(1e4, 5e4, days)
+    df = pd.DataFrame({
+        "timestamp": pd.date_range(end=pd.Timestamp.today().normalize(), periods=days, freq="D"),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": volume,
+        "turnover": volume * close,
+    })
+    df["target"] = df["close"].shift(-1)
+    return df
+
+
+def timeit(func, repeat: int = 5):
+    """Run ``func`` ``repeat`` times and return (median seconds, last result)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)), result
@@ -0,0 +1,98 @@
+# ml_service/benchmarks/event_loop_latency.py
+"""/health latency while predictions and a retrain are running.
+
+Polls /health on an idle service, then again while worker threads keep
+posting /predict and one /retrain is in progress. If blocking work ran on the
+event loop, /health would wait behind it and its latency would jump from
+milliseconds to seconds. Exits with status 1 when the loaded p95 exceeds the
+idle p95 by more than --max-increase-ms.
+
+Start the service first, then run from the ml_service directory:
+
+    uvicorn app.main:app --port 8000
+    python benchmarks/event_loop_latency.py --url http://localhost:8000
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+
+import numpy as np
+
+
+def request(url: str, payload=None, timeout: float = 600.0) -> float:
+    """Send one request and return its latency in seconds."""
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def poll_health(url: str, seconds: float, interval: float = 0.05):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        latencies.append(request(f"{url}/health"))
+        time.sleep(interval)
+    return np.array(latencies) * 1000
+
+
+def load(url: str, stop: threading.Event, counts: dict, crypto: str, model: str):
+    payload = {"crypto": crypto, "days": 30, "model_type": model}
+    while not stop.is_set():
+        try:
+            request(f"{url}/predict", payload)
+            counts["predictions"] += 1
+        except Exception:
+            counts["errors"] += 1
+
+
+def describe(name: str, latencies: np.ndarray):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{name:<8} n={len(latencies):<5} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms   max {latencies.max():8.2f} ms")
+    return p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each measurement")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent /predict clients")
+    parser.add_argument("--crypto", default="btc")
+    parser.add_argument("--model", default="random_forest")
+    parser.add_argument("--max-increase-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    url = args.url.rstrip("/")
+
+    idle_p95 = describe("idle", poll_health(url, args.seconds))
+
+    stop = threading.Event()
+    counts = {"predictions": 0, "errors": 0}
+    clients = [
+        threading.Thread(target=load, args=(url, stop, counts, args.crypto, args.model), daemon=True)
+        for _ in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+    request(f"{url}/retrain?crypto={args.crypto}", payload={})
+    try:
+        loaded_p95 = describe("loaded", poll_health(url, args.seconds))
+    finally:
+        stop.set()
+        for client in clients:
+            client.join()
+
+    print(f"{counts['predictions']} predictions ({counts['errors']} errors) served during the loaded run")
+    increase = loaded_p95 - idle_p95
+    if increase > args.max_increase_ms:
+        print(f"FAIL: /health p95 grew by {increase:.2f} ms under load")
+        sys.exit(1)
+    print(f"OK: /health p95 grew by {increase:.2f} ms under load")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# ml_service/benchmarks/feature_pipeline.py
+"""Cost of the feature pipeline and what its features change in the hold-out error.
+
+- Checks that advancing the rolling state candle by candle, as recursive
+  forecasts do, reproduces the rows ``transform`` computes for the whole
+  history, and times a step against recomputing the features of the history.
+- Fits the close model of every model type on the bare candle and on the
+  pipeline features over the same rows and compares their hold-out MAE.
+
+Run from the ml_service directory:
+
+    python benchmarks/feature_pipeline.py
+"""
+import warnings
+
+import numpy as np
+
+from common import synthetic_history, timeit
+
+from app.features import FeaturePipeline, CANDLE_FEATURES
+from app.forecasting import CLOSE_INDEX
+from app.training import fit_estimator
+
+
+MODEL_NAMES = ["random_forest", "xgboost", "lightgbm"]
+
+
+def main(days: int = 1000, steps: int = 30, repeat: int = 5):
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    df = synthetic_history(days).dropna().reset_index(drop=True)
+    pipeline = FeaturePipeline()
+    candles = df[CANDLE_FEATURES].to_numpy(dtype=np.float64)
+
+    transform, X = timeit(lambda: pipeline.transform(df), repeat)
+
+    def replay():
+        # Start `steps` candles before the end and push the rest one by one
+        state = pipeline.rolling_state(df[:len(df) - steps])
+        rows = []
+        for candle in candles[len(df) - steps:]:
+            state.push(candle)
+            rows.append(state.row[0].copy())
+        return np.array(rows)
+
+    rolling, rows = timeit(replay, repeat)
+    assert np.allclose(rows, X[-steps:], rtol=1e-9, atol=0), "rolling state and transform disagree"
+
+    print(f"{len(pipeline)} features on {days} days of history")
+    print(f"{'transform, whole history':<36}{transform * 1000:>10.2f} ms")
+    print(f"{'transform per step, ' + str(steps) + ' steps':<36}{transform * steps * 1000:>10.2f} ms")
+    print(f"{'rolling state, ' + str(steps) + ' steps':<36}{rolling * 1000:>10.2f} ms")
+
+    # Same rows for both, the first ones lack history for the pipeline features
+    X = X[pipeline.warmup:]
+    y = X[1:, CLOSE_INDEX]
+    inputs = {"candle": X[:-1, :len(CANDLE_FEATURES)], "pipeline": X[:-1]}
+
+    print(f"\n{'model':<15}{'candle MAE':>12}{'pipeline MAE':>14}")
+    for model_name in MODEL_NAMES:
+        mae = {name: fit_estimator(model_name, "close", inputs[name], y)["mae"] for name in inputs}
+        print(f"{model_name:<15}{mae['candle']:>12.2f}{mae['pipeline']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
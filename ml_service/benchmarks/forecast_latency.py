@@ -0,0 +1,108 @@
+# ml_service/benchmarks/forecast_latency.py
+"""Per-forecast latency of the recursive forecaster.
+
+Compares the original DataFrame-per-step loop, the NumPy loop over one model
+per feature, the NumPy loop over a single multi-output feature model and the
+direct strategy (one predict over all horizons).
+
+Run from the ml_service directory:
+
+    python benchmarks/forecast_latency.py
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from common import synthetic_history, timeit
+
+from sklearn.ensemble import RandomForestRegressor
+import xgboost as xgb
+import lightgbm as lgb
+
+from app.forecasting import forecast_n_days, FEATURES, AUX_TARGETS, MAX_HORIZON
+from app.training import make_multi_output_model
+
+
+MODEL_CLASSES = {
+    "random_forest": RandomForestRegressor,
+    "xgboost": xgb.XGBRegressor,
+    "lightgbm": lgb.LGBMRegressor,
+}
+
+
+def train_models(df: pd.DataFrame, model_name: str):
+    models = {}
+    X = df[FEATURES][:-1]
+    for target in AUX_TARGETS + ["close"]:
+        y = df[target].shift(-1)[:-1]
+        kwargs = {"verbose": -1} if model_name == "lightgbm" else {}
+        models[target] = MODEL_CLASSES[model_name](n_estimators=100, random_state=42, **kwargs).fit(X, y)
+    return models
+
+
+def train_batched_models(df: pd.DataFrame, model_name: str, per_target_models):
+    X = df[FEATURES][:-1]
+    Y = df[AUX_TARGETS].shift(-1)[:-1]
+    horizons = pd.concat({h: df["close"].shift(-h) for h in range(1, MAX_HORIZON + 1)}, axis=1)
+    return {
+        "features": make_multi_output_model(model_name).fit(X, Y),
+        "close": per_target_models["close"],
+        "direct": make_multi_output_model(model_name).fit(df[FEATURES][:-MAX_HORIZON], horizons[:-MAX_HORIZON]),
+    }
+
+
+def legacy_forecast_n_days(models, df: pd.DataFrame, n_days: int):
+    # The DataFrame-per-step implementation this benchmark compares against
+    preds = []
+    last_row = df.iloc[-1:].copy()
+    for _ in range(n_days):
+        next_features = {}
+        for feat in ["open", "high", "low", "volume", "turnover"]:
+            X_feat = last_row[["open", "high", "low", "close", "volume", "turnover"]].values
+            next_features[feat] = models[feat].predict(X_feat)[0]
+        feature_row = {
+            "open": next_features["open"],
+            "high": next_features["high"],
+            "low": next_features["low"],
+            "close": last_row["close"].values[0],
+            "volume": next_features["volume"],
+            "turnover": next_features["turnover"],
+        }
+        X_close = pd.DataFrame([feature_row])[["open", "high", "low", "close", "volume", "turnover"]]
+        y_close = models["close"].predict(X_close)[0]
+        preds.append(y_close)
+        last_row = pd.DataFrame([{
+            "timestamp": last_row["timestamp"].values[0] + pd.Timedelta(days=1),
+            "open": next_features["open"],
+            "high": next_features["high"],
+            "low": next_features["low"],
+            "close": y_close,
+            "volume": next_features["volume"],
+            "turnover": next_features["turnover"],
+        }])
+    future_dates = pd.date_range(start=df["timestamp"].iloc[-1] + pd.Timedelta(days=1), periods=n_days)
+    return pd.DataFrame({"timestamp": future_dates, "predicted_close": preds})
+
+
+def main(n_days: int = 30, repeat: int = 5):
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    df = synthetic_history()
+
+    print(f"{'model':<15}{'before, ms':>12}{'numpy, ms':>12}{'batched, ms':>13}{'direct, ms':>12}{'speedup':>10}")
+    for model_name in MODEL_CLASSES:
+        models = train_models(df, model_name)
+        batched_models = train_batched_models(df, model_name, models)
+        before, expected = timeit(lambda: legacy_forecast_n_days(models, df, n_days), repeat)
+        numpy_loop, actual = timeit(lambda: forecast_n_days(models, df, model_name, n_days), repeat)
+        batched, _ = timeit(lambda: forecast_n_days(batched_models, df, model_name, n_days), repeat)
+        direct, _ = timeit(lambda: forecast_n_days(batched_models, df, model_name, n_days, "direct"), repeat)
+        assert np.allclose(expected["predicted_close"], actual["predicted_close"])
+        print(
+            f"{model_name:<15}{before * 1000:>12.1f}{numpy_loop * 1000:>12.1f}"
+            f"{batched * 1000:>13.1f}{direct * 1000:>12.1f}{before / batched:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
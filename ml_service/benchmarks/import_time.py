@@ -0,0 +1,106 @@
+# ml_service/benchmarks/import_time.py
+"""Cold import time of the service, measured with ``python -X importtime``.
+
+Imports app.main in fresh interpreters, reports the median total and the
+heaviest modules it pulls in, and exits with status 1 when
+
+- any model library or matplotlib is imported at startup, they belong to the
+  first training, model load or chart render, or
+- the median total exceeds the recorded baseline by more than --tolerance.
+
+Run from the ml_service directory, --update-baseline records the current
+median as the new baseline:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --update-baseline
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+
+# Imported on first use only, never while the service starts
+LAZY_MODULES = ["sklearn", "xgboost", "lightgbm", "prophet", "matplotlib"]
+
+
+def import_times(module: str):
+    """Import ``module`` in a fresh interpreter, return [(depth, name, self us, cumulative us)]."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Every nesting level indents the module name by two more spaces
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to take the median over")
+    parser.add_argument("--top", type=int, default=10, help="heaviest direct imports to show")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline, 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # The first run also warms the bytecode and file system caches
+    import_times(args.module)
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals_ms = [next(row[3] for row in rows if row[1] == args.module) / 1000 for rows in runs]
+    total_ms = float(np.median(totals_ms))
+
+    print(f"import {args.module}: median {total_ms:.0f} ms over {args.runs} runs (min {min(totals_ms):.0f}, max {max(totals_ms):.0f})")
+    print(f"{'module':<40}{'cumulative, ms':>16}")
+    direct = sorted((row for row in runs[-1] if row[0] == 1), key=lambda row: row[3], reverse=True)
+    for _, name, _, cumulative_us in direct[:args.top]:
+        print(f"{name:<40}{cumulative_us / 1000:>16.1f}")
+
+    failed = False
+    imported = {row[1].split(".")[0] for row in runs[-1]}
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        print(f"FAIL: {', '.join(eager)} imported at startup")
+        failed = True
+
+    baseline = None
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+        if baseline.get("module") != args.module:
+            baseline = None
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump({"module": args.module, "median_ms": round(total_ms, 1), "python": platform.python_version()}, f, indent=2)
+        print(f"Baseline updated: {total_ms:.0f} ms")
+    elif baseline is not None:
+        baseline_ms = baseline["median_ms"]
+        limit_ms = baseline_ms * (1 + args.tolerance)
+        if total_ms > limit_ms:
+            print(f"FAIL: {total_ms:.0f} ms exceeds the baseline {baseline_ms:.0f} ms by more than {args.tolerance:.0%}")
+            failed = True
+        else:
+            print(f"OK: within {args.tolerance:.0%} of the baseline {baseline_ms:.0f} ms")
+    else:
+        print(f"No baseline recorded for {args.module} yet, run with --update-baseline")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
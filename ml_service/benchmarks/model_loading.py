@@ -0,0 +1,61 @@
+# ml_service/benchmarks/model_loading.py
+"""Load time and size of pickled model bundles versus artifact directories.
+
+Trains every tree model on synthetic history, stores each bundle both as a
+joblib pickle (the old format) and as an artifact directory, checks that both
+forecast the same prices and times loading them.
+
+Run from the ml_service directory:
+
+    python benchmarks/model_loading.py
+"""
+import os
+import shutil
+import tempfile
+import warnings
+
+import joblib
+import numpy as np
+
+from common import synthetic_history, timeit
+
+from app.artifacts import save_artifact, load_artifact, artifact_size
+from app.forecasting import forecast_n_days
+from app.training import train_bundles
+
+
+MODEL_NAMES = ["random_forest", "xgboost", "lightgbm"]
+
+
+def main(n_days: int = 30, repeat: int = 5):
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    df = synthetic_history().dropna().reset_index(drop=True)
+    bundles = train_bundles(df, MODEL_NAMES)
+    directory = tempfile.mkdtemp()
+
+    print(f"{'model':<15}{'pickle, ms':>12}{'artifact, ms':>14}{'pickle, MB':>12}{'artifact, MB':>14}")
+    try:
+        for model_name, bundle in bundles.items():
+            models = bundle["models"]
+            pickle_path = os.path.join(directory, f"{model_name}.pkl")
+            artifact_path = os.path.join(directory, model_name)
+            joblib.dump(models, pickle_path)
+            save_artifact(artifact_path, models)
+
+            pickle_load, _ = timeit(lambda: joblib.load(pickle_path), repeat)
+            artifact_load, artifact = timeit(lambda: load_artifact(artifact_path), repeat)
+            for strategy in ["recursive", "direct"]:
+                expected = forecast_n_days(models, df, model_name, n_days, strategy)["predicted_close"]
+                actual = forecast_n_days(artifact, df, model_name, n_days, strategy)["predicted_close"]
+                assert np.allclose(expected, actual), f"{model_name} {strategy} forecasts differ"
+
+            print(
+                f"{model_name:<15}{pickle_load * 1000:>12.1f}{artifact_load * 1000:>14.1f}"
+                f"{os.path.getsize(pickle_path) / 2**20:>12.2f}{artifact_size(artifact_path) / 2**20:>14.2f}"
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
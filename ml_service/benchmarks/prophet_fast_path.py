@@ -0,0 +1,79 @@
+# ml_service/benchmarks/prophet_fast_path.py
+"""Prophet forecast and refit times on a 1000-day history.
+
+Forecasting: the original path predicted the whole history plus the future
+with 1000 uncertainty samples and kept the tail, the fast path predicts only
+the future dates and skips the uncertainty sampling (ML_PROPHET_UNCERTAINTY_SAMPLES).
+
+Refitting: a daily retrain sees the history window move by one candle, it is
+fitted from scratch and warm-started from the previous retrain. Each retrain
+fits a hold-out model to measure the MAE and the served model on the whole
+history, each starts from its counterpart of the previous retrain.
+
+Run from the ml_service directory:
+
+    python benchmarks/prophet_fast_path.py
+"""
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from common import synthetic_history, timeit
+
+from prophet import Prophet
+
+from app.forecasting import forecast_n_days
+from app.training import fit_prophet, warm_start_params
+
+
+def legacy_forecast(model, n_days: int) -> pd.DataFrame:
+    # The history-plus-future implementation this benchmark compares against
+    model.uncertainty_samples = 1000
+    future = model.make_future_dataframe(periods=n_days)
+    forecast = model.predict(future)
+    result = forecast[["ds", "yhat"]].tail(n_days)
+    result.columns = ["timestamp", "predicted_close"]
+    return result
+
+
+def future_only_forecast(model, df: pd.DataFrame, n_days: int, uncertainty_samples: int) -> pd.DataFrame:
+    model.uncertainty_samples = uncertainty_samples
+    future = pd.DataFrame({"ds": pd.date_range(start=df["timestamp"].iloc[-1] + pd.Timedelta(days=1), periods=n_days)})
+    return model.predict(future)[["ds", "yhat"]]
+
+
+def main(days: int = 1000, n_days: int = 30, repeat: int = 3):
+    logging.getLogger("cmdstanpy").disabled = True
+    warnings.filterwarnings("ignore")
+    df = synthetic_history(days).dropna().reset_index(drop=True)
+    df_p = df[["timestamp", "close"]].rename(columns={"timestamp": "ds", "close": "y"})
+
+    # Forecasting, with a model fitted on the whole history so both paths forecast the same dates
+    model = Prophet().fit(df_p)
+    legacy, expected = timeit(lambda: legacy_forecast(model, n_days), repeat)
+    sampled, _ = timeit(lambda: future_only_forecast(model, df, n_days, 1000), repeat)
+    fast, actual = timeit(lambda: forecast_n_days({"prophet": model}, df, "prophet", n_days), repeat)
+    assert np.allclose(expected["predicted_close"].to_numpy(), actual["predicted_close"].to_numpy())
+    assert (expected["timestamp"].to_numpy() == actual["timestamp"].to_numpy()).all()
+
+    print(f"{n_days}-day forecast on {days} days of history")
+    print(f"{'history + future, 1000 samples':<36}{legacy * 1000:>10.1f} ms")
+    print(f"{'future only, 1000 samples':<36}{sampled * 1000:>10.1f} ms")
+    print(f"{'future only, no samples':<36}{fast * 1000:>10.1f} ms{legacy / fast:>9.1f}x")
+
+    # Refitting after one new candle, the published model saw the window one day earlier
+    previous = fit_prophet(df_p[:-1])
+    warm_start = {**previous["warm_start"], "model": warm_start_params(previous["model"])}
+    cold, cold_fit = timeit(lambda: fit_prophet(df_p[1:]), repeat)
+    warm, warm_fit = timeit(lambda: fit_prophet(df_p[1:], warm_start), repeat)
+    assert all(warm_fit["warm_started"].values())
+
+    print(f"\nRetrain on {days - 1} days of history after the window moved by one candle")
+    print(f"{'cold start':<36}{cold * 1000:>10.1f} ms   hold-out MAE {cold_fit['mae']:.2f}")
+    print(f"{'warm start':<36}{warm * 1000:>10.1f} ms   hold-out MAE {warm_fit['mae']:.2f}{cold / warm:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# ml_service/tests/conftest.py
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# Tests reuse the Bybit stub and synthetic candles of the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bybit_stub import Handler
+
+
+_monkeypatch = pytest.MonkeyPatch()
+_stub: ThreadingHTTPServer = None
+_scratch: str = None
+
+
+def pytest_configure(config):
+    # app.config reads the environment on import, so the service is pointed at the
+    # stub and at a scratch directory before any test module imports it. The tracked
+    # models and candles are left alone.
+    global _stub, _scratch
+    _stub = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=_stub.serve_forever, daemon=True).start()
+    _scratch = tempfile.mkdtemp(prefix="ml_service-tests-")
+    _monkeypatch.setenv("ML_BYBIT_BASE_URL", f"http://127.0.0.1:{_stub.server_address[1]}")
+    _monkeypatch.setenv("ML_MODELS_DIR", os.path.join(_scratch, "models"))
+    _monkeypatch.setenv("ML_DATA_DIR", os.path.join(_scratch, "data"))
+
+
+def pytest_unconfigure(config):
+    _monkeypatch.undo()
+    if _stub is not None:
+        _stub.shutdown()
+    if _scratch is not None:
+        shutil.rmtree(_scratch, ignore_errors=True)
@@ -0,0 +1,136 @@
+# ml_service/tests/test_artifacts.py
+"""Packed trees predict what the libraries they were packed from predict.
+
+PackedForest and PackedBoosters walk sklearn and XGBoost trees over their
+own node arrays. These tests compare them with the native ``predict`` for
+single and multiple outputs, on rows that sit exactly on split thresholds
+and next to them, and on rows with missing features. An artifact written
+and read back by save_artifact/load_artifact predicts the same too.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from app.artifacts import PackedForest, PackedBoosters, save_artifact, load_artifact, read_manifest
+from app.features import FeaturePipeline
+from app.training import make_close_model, make_multi_output_model
+
+
+def regression_data(n_outputs: int, rows: int = 300, features: int = 6, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features))
+    # Few distinct values in the first columns, many rows share a split's neighbourhood
+    X[:, :2] = np.round(X[:, :2], 1)
+    y = X @ rng.normal(size=(features, n_outputs)) + np.sin(3 * X[:, :1]) + rng.normal(scale=0.1, size=(rows, n_outputs))
+    return X, (y[:, 0] if n_outputs == 1 else y)
+
+
+def edge_rows(X: np.ndarray, feature: np.ndarray, threshold: np.ndarray, splits: int = 200) -> np.ndarray:
+    """Copies of rows of ``X`` with one feature set exactly on a split threshold,
+    and to the float32 values right below and above it."""
+    rng = np.random.default_rng(1)
+    picked = rng.choice(len(feature), size=min(splits, len(feature)), replace=False)
+    rows = []
+    for node in picked:
+        value = np.float32(threshold[node])
+        for candidate in (value, np.nextafter(value, np.float32(-np.inf)), np.nextafter(value, np.float32(np.inf))):
+            row = X[rng.integers(len(X))].copy()
+            row[feature[node]] = candidate
+            rows.append(row)
+    return np.array(rows)
+
+
+def with_missing(X: np.ndarray, fraction: float = 0.2) -> np.ndarray:
+    rng = np.random.default_rng(2)
+    X = X.copy()
+    X[rng.random(X.shape) < fraction] = np.nan
+    return X
+
+
+def forest_splits(packed: PackedForest):
+    internal = packed.left != np.arange(len(packed.left))
+    return packed.feature[internal], packed.threshold[internal]
+
+
+def booster_splits(packed: PackedBoosters):
+    internal = packed.children[:, 0] != np.arange(len(packed.children))
+    return packed.feature[internal], packed.threshold[internal]
+
+
+@pytest.mark.parametrize("n_outputs", [1, 5])
+def test_packed_forest_matches_sklearn(n_outputs):
+    X, y = regression_data(n_outputs)
+    # Single output as the close model, several as the standardised feature model
+    model = make_close_model("random_forest") if n_outputs == 1 else make_multi_output_model("random_forest")
+    model.fit(X, y)
+    packed = PackedForest.from_estimator(model)
+
+    for rows in (X, edge_rows(X, *forest_splits(packed))):
+        np.testing.assert_allclose(packed.predict(rows), model.predict(rows), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("train_missing", [0.0, 0.3], ids=["complete", "missing"])
+def test_packed_forest_matches_sklearn_on_missing_features(train_missing):
+    X, y = regression_data(1)
+    # Without missing values in training sklearn sends them to the larger child,
+    # with them every split learns a side
+    model = make_close_model("random_forest").fit(with_missing(X, train_missing), y)
+    packed = PackedForest.from_estimator(model)
+
+    rows = with_missing(X)
+    np.testing.assert_allclose(packed.predict(rows), model.predict(rows), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("n_outputs", [1, 30])
+def test_packed_boosters_match_xgboost(n_outputs):
+    X, y = regression_data(n_outputs)
+    # Single output as the close model, many as the direct multi-horizon model
+    model = make_close_model("xgboost") if n_outputs == 1 else make_multi_output_model("xgboost")
+    model.fit(X, y)
+    packed = PackedBoosters.from_estimator(model)
+
+    for rows in (X, edge_rows(X, *booster_splits(packed)), with_missing(X)):
+        # XGBoost sums leaves in float32
+        np.testing.assert_allclose(packed.predict(rows), model.predict(rows), rtol=1e-5, atol=1e-4)
+
+
+def test_packed_boosters_follow_learned_missing_direction():
+    X, y = regression_data(1)
+    # Missing values in training give splits a learned default direction, both ways
+    X_train = with_missing(X, fraction=0.3)
+    model = make_close_model("xgboost").fit(X_train, y)
+    packed = PackedBoosters.from_estimator(model)
+
+    internal = packed.children[:, 0] != np.arange(len(packed.children))
+    directions = packed.missing[internal] == packed.children[internal, 0]
+    assert directions.any() and not directions.all()
+    for rows in (X_train, with_missing(X, fraction=0.6)):
+        np.testing.assert_allclose(packed.predict(rows), model.predict(rows), rtol=1e-5, atol=1e-4)
+
+
+def test_artifact_round_trip(tmp_path):
+    X, y = regression_data(1)
+    _, Y = regression_data(5)
+    models = {
+        "pipeline": FeaturePipeline(),
+        "forest": make_multi_output_model("random_forest").fit(X, Y),
+        "xgboost": make_multi_output_model("xgboost").fit(X, Y),
+        "lightgbm": make_close_model("lightgbm").fit(X, y),
+        "lightgbm_stack": make_multi_output_model("lightgbm").fit(X, Y),
+    }
+    path = str(tmp_path / "model")
+    save_artifact(path, models)
+    loaded = load_artifact(path)
+
+    kinds = {name: entry["kind"] for name, entry in read_manifest(path)["components"].items()}
+    assert kinds == {"pipeline": "pipeline", "forest": "forest", "xgboost": "xgboost_trees", "lightgbm": "lightgbm", "lightgbm_stack": "lightgbm"}
+    # Boosters are kept as model text, which does not depend on the library version like a pickle
+    assert not any(name.endswith(".pkl") for name in os.listdir(path))
+
+    assert loaded["pipeline"].to_config() == models["pipeline"].to_config()
+    rows = with_missing(X, fraction=0.05)
+    np.testing.assert_allclose(loaded["forest"].predict(rows), models["forest"].predict(rows), rtol=1e-12)
+    np.testing.assert_allclose(loaded["xgboost"].predict(rows), models["xgboost"].predict(rows), rtol=1e-5, atol=1e-4)
+    np.testing.assert_array_equal(loaded["lightgbm"].predict(rows), models["lightgbm"].predict(rows))
+    np.testing.assert_array_equal(loaded["lightgbm_stack"].predict(rows), models["lightgbm_stack"].predict(rows))
@@ -0,0 +1,75 @@
+# ml_service/tests/test_event_loop.py
+"""/health and /health/live stay fast while slow predictions and a retrain run.
+
+The first /predict of a model that is not stored yet trains it, and /retrain
+trains every model type of a crypto, both take seconds. Blocking work belongs
+in the executors and the training pool, so the event loop keeps answering
+the health probes meanwhile. The service talks to the Bybit stub from
+benchmarks/ and keeps its models and candles in a scratch directory (see
+conftest.py).
+
+Run from the ml_service directory:
+
+    poetry run pytest tests
+"""
+import time
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+
+# Slowest health probe answer accepted while models are being trained
+HEALTH_BOUND_SECONDS = 0.5
+PROBES = ["/health", "/health/live"]
+
+
+@pytest.fixture(scope="module")
+def app():
+    from app.main import app
+
+    return app
+
+
+async def timed_get(client, path: str) -> float:
+    started = time.perf_counter()
+    response = await client.get(path)
+    assert response.status_code == 200
+    return time.perf_counter() - started
+
+
+async def probes_during_training(app):
+    # No lifespan: nothing is trained at startup, so the predictions train their models
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://service", timeout=600) as client:
+        # The transport returns once the background retrain has finished too
+        slow = asyncio.gather(
+            client.post("/predict", json={"crypto": "btc", "days": 7, "model_type": "random_forest"}),
+            client.post("/predict", json={"crypto": "btc", "days": 7, "model_type": "xgboost"}),
+            client.post("/retrain", params={"crypto": "eth"}),
+        )
+        latencies = {path: [] for path in PROBES}
+        while not slow.done():
+            for path in PROBES:
+                latencies[path].append(await timed_get(client, path))
+            await asyncio.sleep(0.05)
+        return await slow, latencies
+
+
+def test_health_stays_fast_during_training(app):
+    from app.main import ModelState
+
+    responses, latencies = asyncio.run(probes_during_training(app))
+
+    *predictions, retrain = responses
+    for response in predictions:
+        assert response.status_code == 200, response.text
+        assert len(response.json()["predictions"]) == 7
+    assert retrain.status_code == 200, retrain.text
+    assert set(ModelState.model_info.get("eth", {})) == {"random_forest", "xgboost", "lightgbm", "prophet"}
+
+    for path, samples in latencies.items():
+        # Models were trained the whole time, so the probe was polled throughout
+        assert len(samples) >= 10
+        assert max(samples) < HEALTH_BOUND_SECONDS, f"{path} took up to {max(samples) * 1000:.0f} ms"
@@ -0,0 +1,46 @@
+# ml_service/tests/test_features.py
+"""The rolling feature states agree with each other and with FeaturePipeline.transform.
+
+Serving advances one series with features.RollingState, backtests advance
+every origin of a fold at once with backtest.BatchRollingState. Both keep
+their own copy of the running window math, so these tests pin them to the
+same rows.
+"""
+import numpy as np
+import pytest
+
+from common import synthetic_history
+
+from app.backtest import BatchRollingState
+from app.features import FeaturePipeline, CANDLE_FEATURES
+
+
+@pytest.fixture(scope="module")
+def history():
+    return synthetic_history(400).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("pipeline", [FeaturePipeline(), FeaturePipeline(lags=(1, 5), returns=(3,), windows=(2, 14))], ids=repr)
+def test_rolling_states_match_transform(history, pipeline):
+    X = pipeline.transform(history)
+    candles = history[CANDLE_FEATURES].to_numpy(dtype=np.float64)
+    ends = np.array([pipeline.warmup, 100, 250, 300])
+    steps = len(history) - 1 - ends.max()
+
+    batch = BatchRollingState(pipeline, history, ends)
+    states = [pipeline.rolling_state(history.iloc[:end + 1]) for end in ends]
+    for step in range(steps + 1):
+        if step:
+            batch.push(candles[ends + step])
+            for state, end in zip(states, ends):
+                state.push(candles[end + step])
+        expected = X[ends + step]
+        scalar = np.vstack([state.row for state in states])
+        np.testing.assert_allclose(batch.row, scalar, rtol=1e-12, atol=0)
+        np.testing.assert_allclose(scalar, expected, rtol=1e-9, atol=0)
+
+
+def test_batch_rolling_state_needs_warmup(history):
+    pipeline = FeaturePipeline()
+    with pytest.raises(ValueError):
+        BatchRollingState(pipeline, history, np.array([pipeline.warmup - 1, 100]))